@@ -1,19 +1,23 @@
 import streamlit as st
 import pandas as pd
 import json
-import tempfile
-import zipfile
+import fnmatch
+import hashlib
+import uuid
 from pathlib import Path
-import io
+from typing import NamedTuple
 import sys
 import os
 
-# Import the processing functions from main.py
-from main import (
-    process_xlsx, process_csv, process_sheet,
-    bq_schema_from_df, format_dates_for_csv,
-    write_clean_csv, find_unbalanced_quote_lines,
-    infer_column, simple_header, strip_cell
+# The pipeline itself (main.py) runs in the job workers, through tasks.py
+from bundles import BundleBuilder
+from parse_cache import ParseCache, parse_settings, path_key, upload_key
+from jobs import JOB_POLL_SECONDS, JobQueue
+from profiles import find_profile, header_signature, load_profiles, save_profile
+from drift import compare
+from tasks import (
+    infer_layout, process_sheets, profile_schema, read_upload,
+    estimate_parse_cost, estimate_parse_memory, estimate_process_cost, estimate_process_memory
 )
 
 # ============================================================================
@@ -50,6 +54,37 @@ def is_maintenance_mode():
     
     return False
 
+def get_server_data_dir():
+    """
+    Directory on the app host whose files can be processed by path instead of
+    uploaded (SERVER_DATA_DIR environment variable or Streamlit secret).
+    Returns None when not configured or not a directory.
+    """
+    data_dir = os.getenv("SERVER_DATA_DIR", "")
+    if not data_dir:
+        try:
+            data_dir = st.secrets.get("SERVER_DATA_DIR", "")
+        except (AttributeError, KeyError, FileNotFoundError):
+            # Secrets not configured, which is fine
+            data_dir = ""
+    if data_dir and Path(data_dir).is_dir():
+        return Path(data_dir).resolve()
+    return None
+
+class ServerFile(NamedTuple):
+    """A file under the server data directory, used in place of an UploadedFile"""
+    name: str   # path relative to the data directory
+    path: str
+    size: int
+
+def list_server_files(data_dir: Path) -> list:
+    """Supported data files below data_dir, as ServerFile entries"""
+    files = []
+    for path in sorted(data_dir.rglob("*")):
+        if path.suffix.lower() in {'.xlsx', '.xlsm', '.xls', '.csv'} and path.is_file():
+            files.append(ServerFile(path.relative_to(data_dir).as_posix(), str(path), path.stat().st_size))
+    return files
+
 # ============================================================================
 # SHARED UI ELEMENTS
 # ============================================================================
@@ -428,29 +463,6 @@ def render_shared_css():
             margin-bottom: 1.5rem;
         }
         
-        /* Improved schema review table styling */
-        .schema-review-row {
-            transition: all 0.2s ease;
-            border-radius: 8px;
-            padding: 0.25rem 0;
-            margin-bottom: 0.25rem;
-        }
-        
-        .schema-review-row:hover {
-            background-color: #f9fafb;
-            transform: translateX(4px);
-        }
-        
-        /* Reduce spacing between schema review rows */
-        .schema-review-row + .schema-review-row {
-            margin-top: 0;
-        }
-        
-        /* Reduce column padding within schema review rows */
-        .schema-review-row div[data-testid="column"] {
-            padding: 0.25rem 0.5rem !important;
-        }
-        
         /* Better selectbox styling */
         [data-baseweb="select"] {
             border-radius: 8px !important;
@@ -496,38 +508,6 @@ def render_shared_css():
             padding: 0.5rem !important;
         }
         
-        /* Reduced spacing for columns in schema review */
-        .schema-review-container div[data-testid="column"],
-        .schema-review-row div[data-testid="column"] {
-            padding: 0.25rem 0.5rem !important;
-        }
-        
-        /* Better visual hierarchy for schema review */
-        .schema-column-name {
-            font-weight: 600;
-            color: #111827;
-            font-size: 0.95rem;
-        }
-        
-        .schema-inferred-type {
-            color: #6b7280;
-            font-size: 0.9rem;
-            padding: 0.25rem 0.5rem;
-            background: #f3f4f6;
-            border-radius: 6px;
-            display: inline-block;
-        }
-        
-        .schema-sample-values {
-            color: #6b7280;
-            font-size: 0.85rem;
-            font-family: 'Monaco', 'Menlo', 'Ubuntu Mono', monospace;
-            background: #f9fafb;
-            padding: 0.5rem;
-            border-radius: 6px;
-            line-height: 1.5;
-        }
-        
         /* Loading spinner improvements */
         .stSpinner > div {
             border-color: #274156 !important;
@@ -640,21 +620,6 @@ def render_shared_css():
             margin: 1.5rem 0 !important;
         }
         
-        /* Better table/card spacing */
-        .schema-review-container {
-            background: #ffffff;
-            border: 1px solid #e5e7eb;
-            border-radius: 12px;
-            padding: 1.5rem;
-            margin-bottom: 1.5rem;
-            box-shadow: 0 1px 3px rgba(0,0,0,0.05);
-            transition: all 0.2s ease;
-        }
-        
-        .schema-review-container:hover {
-            box-shadow: 0 4px 12px rgba(0,0,0,0.1);
-        }
-        
         /* Mobile responsiveness improvements */
         @media (max-width: 768px) {
             .main .block-container {
@@ -666,10 +631,6 @@ def render_shared_css():
                 font-size: 1.25rem;
                 margin-top: 1.5rem;
             }
-            
-            .schema-review-container {
-                padding: 1rem;
-            }
         }
         
         /* Focus visible for accessibility */
@@ -1393,38 +1354,6 @@ def render_shared_logo_script():
         }
     });
     
-    // Highlight selected schema row on interaction
-    function addSchemaRowInteractions() {
-        const schemaRows = document.querySelectorAll('.schema-review-row');
-        schemaRows.forEach(function(row) {
-            // Only add listeners if not already added
-            if (!row.dataset.interactive) {
-                row.dataset.interactive = 'true';
-                row.addEventListener('mouseenter', function() {
-                    this.style.backgroundColor = '#f9fafb';
-                    this.style.transform = 'translateX(4px)';
-                });
-                row.addEventListener('mouseleave', function() {
-                    this.style.backgroundColor = '';
-                    this.style.transform = '';
-                });
-            }
-        });
-    }
-    
-    // Run on page load and when DOM changes
-    addSchemaRowInteractions();
-    setTimeout(addSchemaRowInteractions, 100);
-    setTimeout(addSchemaRowInteractions, 500);
-    
-    const schemaObserver = new MutationObserver(function(mutations) {
-        addSchemaRowInteractions();
-    });
-    schemaObserver.observe(document.body, {
-        childList: true,
-        subtree: true
-    });
-    
     // Prevent any interference with navigation buttons
     function protectNavigationButtons() {
         // Find buttons by their data-testid keys
@@ -1680,179 +1609,381 @@ def render_maintenance_page():
 # ============================================================================
 # MAIN APP FUNCTIONALITY
 # ============================================================================
-def create_download_zip(temp_dir):
+# Every output file is compressed once, as it is produced, into a
+# BundleBuilder; the download ZIPs below copy those compressed entries.
+def create_download_zip(bundles):
     """Create a zip file with all output files"""
-    zip_buffer = io.BytesIO()
-    
-    with zipfile.ZipFile(zip_buffer, 'w', zipfile.ZIP_DEFLATED) as zip_file:
-        for file_path in Path(temp_dir).rglob('*'):
-            if file_path.is_file():
-                zip_file.write(file_path, file_path.relative_to(temp_dir))
-    
-    zip_buffer.seek(0)
-    return zip_buffer.getvalue()
+    return bundles.build()
 
-def create_csv_zip(temp_dir):
+def create_csv_zip(bundles):
     """Create a zip file with only CSV files"""
-    zip_buffer = io.BytesIO()
-    output_dir = Path(temp_dir)
-    
-    with zipfile.ZipFile(zip_buffer, 'w', zipfile.ZIP_DEFLATED) as zip_file:
-        csv_files = list(output_dir.glob("*.csv"))
-        for csv_file in csv_files:
-            zip_file.write(csv_file, csv_file.name)
-    
-    zip_buffer.seek(0)
-    return zip_buffer.getvalue()
+    return bundles.build([name for name in bundles.namelist() if name.endswith(".csv")])
 
-def create_schema_zip(temp_dir):
+def create_schema_zip(bundles):
     """Create a zip file with only schema JSON files"""
-    zip_buffer = io.BytesIO()
-    output_dir = Path(temp_dir)
-    
-    with zipfile.ZipFile(zip_buffer, 'w', zipfile.ZIP_DEFLATED) as zip_file:
-        schema_files = list(output_dir.glob("*_bq_schema.json"))
-        for schema_file in schema_files:
-            zip_file.write(schema_file, schema_file.name)
-    
-    zip_buffer.seek(0)
-    return zip_buffer.getvalue()
+    return bundles.build([name for name in bundles.namelist() if name.endswith("_bq_schema.json")])
 
-def create_summary_zip(temp_dir):
+def create_summary_zip(bundles):
     """Create a zip file with only summary TXT files"""
-    zip_buffer = io.BytesIO()
-    output_dir = Path(temp_dir)
-    
-    with zipfile.ZipFile(zip_buffer, 'w', zipfile.ZIP_DEFLATED) as zip_file:
-        summary_files = list(output_dir.glob("*_summary.txt"))
-        for summary_file in summary_files:
-            zip_file.write(summary_file, summary_file.name)
-    
-    zip_buffer.seek(0)
-    return zip_buffer.getvalue()
+    return bundles.build([name for name in bundles.namelist() if name.endswith("_summary.txt")])
 
-def create_schema_text_zip(temp_dir):
+def create_schema_text_zip(bundles):
     """Create a zip file with only schema TXT files"""
-    zip_buffer = io.BytesIO()
-    output_dir = Path(temp_dir)
-    
-    with zipfile.ZipFile(zip_buffer, 'w', zipfile.ZIP_DEFLATED) as zip_file:
-        schema_text_files = list(output_dir.glob("*_bq_schema.txt"))
-        for schema_text_file in schema_text_files:
-            zip_file.write(schema_text_file, schema_text_file.name)
-    
-    zip_buffer.seek(0)
-    return zip_buffer.getvalue()
+    return bundles.build([name for name in bundles.namelist() if name.endswith("_bq_schema.txt")])
+
+def sheet_label(file_name: str, sheet_name: str, file_ext: str, batch: bool) -> str:
+    """Name a sheet is shown and written under; file-prefixed for workbooks in a batch"""
+    if file_ext == 'csv' or not batch:
+        return sheet_name
+    return f"{file_name.rsplit('.', 1)[0]}_{sheet_name}"
+
+def report_job_failure(title: str, job):
+    st.markdown(f"""
+    <div class="error-box">
+        <strong>❌ {title}</strong><br>
+        {job.error}
+    </div>
+    """, unsafe_allow_html=True)
+    st.exception(job.exception)
 
-def perform_initial_inference(df_raw: pd.DataFrame):
+def analyze_uploads(uploaded_files) -> bool:
     """
-    Perform initial type inference on the raw dataframe.
-    Returns a dictionary with column info: {col_name: {'type': bq_type, 'sample_values': [...], 'null_count': int}}
+    Drive reading and layout inference for the uploaded files. Returns True
+    once the review input is in session state; otherwise it has shown the
+    progress (or the failure) and the caller stops there.
     """
-    # Clean headers
-    df_raw.columns = [simple_header(c) for c in df_raw.columns]
+    parse_cache = get_parse_cache()
+    read_results = st.session_state.setdefault('read_results', {})
+    read_jobs = st.session_state.setdefault('read_jobs', {})
+    read_cache_keys = st.session_state.setdefault('read_cache_keys', {})
+    
+    # 1. Read every file (one job per file, in parallel on the shared queue)
+    for uploaded_file in uploaded_files:
+        name = uploaded_file.name
+        if name in read_results:
+            continue
+        job = read_jobs.get(name)
+        if job is None:
+            file_ext = name.split('.')[-1].lower()
+            csv_sheet_name = Path(name).name.split('.')[0] if file_ext == 'csv' else None
+            settings = parse_settings('read', file_ext, csv_sheet_name)
+            if isinstance(uploaded_file, ServerFile):
+                cache_key = path_key(uploaded_file.path, settings)
+            else:
+                cache_key = upload_key(uploaded_file, settings)
+            parsed = parse_cache.get(cache_key)
+            if parsed is not None:
+                read_results[name] = (cache_key, parsed)
+                continue
+            job = get_job_queue().submit(
+                f"Reading {name}", read_upload,
+                # A server file is read straight from disk by the worker: no copy in the app
+                uploaded_file.path if isinstance(uploaded_file, ServerFile) else uploaded_file.getvalue(),
+                file_ext, csv_sheet_name,
+                owner=session_owner(),
+                memory=estimate_parse_memory(uploaded_file.size, file_ext),
+                cost=estimate_parse_cost(uploaded_file.size, file_ext)
+            )
+            read_cache_keys[name] = cache_key
+            read_jobs[name] = job
+        if job.state == 'done':
+            parse_cache.put(read_cache_keys[name], job.result)
+            read_results[name] = (read_cache_keys[name], job.result)
+        elif job.state == 'failed':
+            report_job_failure(f"File Analysis Failed ({name})", job)
+            return False
+        elif job.state == 'cancelled':
+            st.markdown("""
+            <div class="error-box">
+                <strong>❌ File Analysis Cancelled</strong><br>
+                Remove the files and upload them again to restart the analysis.
+            </div>
+            """, unsafe_allow_html=True)
+            return False
+    if len(read_results) < len(uploaded_files):
+        render_job_progress('read_jobs', "Reading your files...")
+        return False
+    
+    # 2. Name the sheets and group them by header layout
+    if not st.session_state.get('sheet_layouts'):
+        batch = len(uploaded_files) > 1
+        raw_dataframes, sheet_sources, file_sheets, layouts, signatures, sources = {}, {}, {}, {}, {}, {}
+        for uploaded_file in uploaded_files:
+            name = uploaded_file.name
+            file_ext = name.split('.')[-1].lower()
+            cache_key, parsed = read_results[name]
+            file_sheets[name] = []
+            for sheet_name in parsed.sheet_names:
+                label = base = sheet_label(name, sheet_name, file_ext, batch)
+                n = 2
+                while label in raw_dataframes:
+                    label, n = f"{base}_{n}", n + 1
+                df_raw = parsed.raw_dataframes[sheet_name]
+                raw_dataframes[label] = df_raw
+                if parsed.sources:
+                    # A server file's sheets stay on disk; the app only holds their first rows
+                    sheet_sources[label] = parsed.sources[sheet_name]
+                file_sheets[name].append(label)
+                signature = header_signature(df_raw)
+                # A layout is named after its first sheet
+                layout = signatures.setdefault(signature, label)
+                layouts.setdefault(layout, []).append(label)
+                sources.setdefault(layout, []).append((cache_key, sheet_name))
+        st.session_state['raw_dataframes'] = raw_dataframes
+        st.session_state['sheet_sources'] = sheet_sources
+        st.session_state['sheet_names'] = list(raw_dataframes)
+        st.session_state['file_sheets'] = file_sheets
+        st.session_state['sheet_layouts'] = layouts
+        st.session_state['layout_signatures'] = {layout: signature for signature, layout in signatures.items()}
+        # A layout's inference is cached under the files and sheets it was built from
+        st.session_state['layout_cache_keys'] = {
+            layout: hashlib.sha256(repr((keys, parse_settings('layout'))).encode('utf-8')).hexdigest()
+            for layout, keys in sources.items()
+        }
+    
+    # 3. Infer each layout once, over all of its sheets; layouts with a saved
+    # profile take its types as they are and skip inference altogether
+    raw_dataframes = st.session_state['raw_dataframes']
+    sheet_sources = st.session_state.get('sheet_sources', {})
+    layouts = st.session_state['sheet_layouts']
+    infer_jobs = st.session_state.setdefault('infer_jobs', {})
+    profiles = load_profiles()
+    layout_profiles = {}
+    profile_types = {}
+    schemas = {}
+    for layout, labels in layouts.items():
+        match = find_profile(profiles, st.session_state['layout_signatures'][layout])
+        if match is not None:
+            layout_profiles[layout] = match[0]
+            profile_types[layout] = dict(match[1]['types'])
+            schemas[layout] = profile_schema(raw_dataframes[labels[0]], match[1]['types'])
+            continue
+        cache_key = st.session_state['layout_cache_keys'][layout]
+        job = infer_jobs.get(layout)
+        if job is None:
+            cached = parse_cache.get_schema(cache_key)
+            if cached is not None:
+                schemas[layout] = cached
+                continue
+            frames = {label: sheet_sources.get(label, raw_dataframes[label]) for label in labels}
+            job = get_job_queue().submit(
+                f"Inferring {layout}" + (f" (+{len(labels) - 1} with the same columns)" if len(labels) > 1 else ""),
+                infer_layout, list(frames.values()), layout,
+                owner=session_owner(),
+                memory=estimate_process_memory(frames),
+                cost=estimate_process_cost(frames)
+            )
+            infer_jobs[layout] = job
+        if job.state == 'done':
+            parse_cache.put_schema(cache_key, job.result)
+            schemas[layout] = job.result
+        elif job.state == 'failed':
+            report_job_failure(f"File Analysis Failed ({layout})", job)
+            return False
+        elif job.state == 'cancelled':
+            st.markdown("""
+            <div class="error-box">
+                <strong>❌ File Analysis Cancelled</strong><br>
+                Remove the files and upload them again to restart the analysis.
+            </div>
+            """, unsafe_allow_html=True)
+            return False
+    if len(schemas) < len(layouts):
+        render_job_progress('infer_jobs', "Inferring data types for all sheets...")
+        return False
+    
+    st.session_state['inferred_schemas'] = schemas
+    st.session_state['layout_profiles'] = layout_profiles
+    # Every layout is processed with the types of its one shared schema (a matching
+    # profile's types as saved), whether or not the user opens it in the review,
+    # which only edits these selections
+    st.session_state['user_selected_types'] = {
+        layout: profile_types.get(layout) or {col: info['type'] for col, info in schema.items()}
+        for layout, schema in schemas.items()
+    }
+    # Set first layout as selected by default
+    st.session_state['selected_sheet'] = next(iter(layouts), None)
+    st.session_state['read_jobs'] = {}
+    st.session_state['infer_jobs'] = {}
+    return True
+
+def start_processing():
+    """Queue one processing job per file; each applies its layouts' selected types"""
+    raw_dataframes = st.session_state.get('raw_dataframes', {})
+    sheet_sources = st.session_state.get('sheet_sources', {})
+    user_selected_types = st.session_state.get('user_selected_types', {})
+    layout_of = {
+        label: layout
+        for layout, labels in st.session_state.get('sheet_layouts', {}).items() for label in labels
+    }
+    jobs = {}
+    for file_name, labels in st.session_state.get('file_sheets', {}).items():
+        frames = {label: sheet_sources.get(label, raw_dataframes[label]) for label in labels}
+        jobs[file_name] = get_job_queue().submit(
+            f"Processing {file_name}",
+            process_sheets,
+            frames,
+            labels,
+            {label: user_selected_types.get(layout_of[label], {}) for label in labels},
+            owner=session_owner(),
+            memory=estimate_process_memory(frames),
+            cost=estimate_process_cost(frames)
+        )
+    st.session_state['processing_jobs'] = jobs
+    st.session_state['output_bundles'] = None
+
+def finish_processing(processing_jobs: dict):
+    """Merge the finished per-file jobs into one download bundle"""
+    st.session_state['processing_jobs'] = {}
+    st.session_state['processing_timings'] = [
+        (f"{name}: {stage}" if len(processing_jobs) > 1 else stage, seconds)
+        for name, job in processing_jobs.items() for stage, seconds in job.snapshot()['timings']
+    ]
+    failed = [job for job in processing_jobs.values() if job.state == 'failed']
+    if failed:
+        report_job_failure("Processing Failed", failed[0])
+        st.session_state['output_bundles'] = None
+        st.session_state['processed'] = False
+        return
     
-    # Clean cells
-    df_raw = df_raw.applymap(strip_cell)
+    completed, entries = [], []
+    for job in processing_jobs.values():
+        if job.result is not None:
+            completed.extend(job.result.sheet_names)
+            entries.extend(job.result.entries)
+    cancelled = any(job.state == 'cancelled' for job in processing_jobs.values())
+    if cancelled and not completed:
+        st.markdown("""
+        <div class="error-box">
+            <strong>❌ Processing Cancelled</strong><br>
+            No sheet was completed. Adjust the schema and process again.
+        </div>
+        """, unsafe_allow_html=True)
+        st.session_state['output_bundles'] = None
+        st.session_state['processed'] = False
+        return
     
-    schema_info = {}
+    total = len(st.session_state.get('sheet_names', []))
+    st.session_state['processing_cancelled'] = (len(completed), total) if cancelled else None
+    st.session_state['output_bundles'] = BundleBuilder.from_entries(entries)
+    st.session_state['processed'] = True
+    st.session_state['schema_review_done'] = True
+
+def cancel_session_jobs():
+    """Cancel this session's background jobs (new upload or files removed)"""
+    for key in ('read_jobs', 'infer_jobs', 'processing_jobs'):
+        for job in (st.session_state.get(key) or {}).values():
+            job.cancel()
+
+def render_stage_timings(timings):
+    """Table of (stage, seconds) pairs"""
+    if timings:
+        timings_df = pd.DataFrame(timings, columns=['Stage', 'Seconds']).round({'Seconds': 2})
+        st.dataframe(timings_df, hide_index=True, use_container_width=True)
+
+def job_status(job, snap: dict):
+    """(fraction done, one-line status) of one job snapshot"""
+    if snap['state'] in ('done', 'failed', 'cancelled'):
+        return 1.0, snap['state'].capitalize()
+    sheets_total = max(snap['sheets_total'], 1)
+    within_sheet = snap['done'] / snap['total'] if snap['total'] else 0
+    fraction = min(1.0, (snap['sheets_done'] + within_sheet) / sheets_total)
+    
+    if snap['state'] == 'queued':
+        status = "Waiting for a free worker"
+        if snap['position']:
+            status += f" (position {snap['position']} in the queue, estimated {snap['cost']:.0f}s of work)"
+    elif job.cancel_requested:
+        status = "Cancelling after the current step..."
+    elif snap['stage'] is None:
+        status = "Starting..."
+    else:
+        status = f"{snap['stage'].capitalize()}"
+        if snap['sheet'] is not None:
+            status = f"Sheet {min(snap['sheets_done'] + 1, sheets_total)} of {sheets_total} ({snap['sheet']}): {snap['stage']}"
+        if snap['total']:
+            status += f" - column {snap['done'] + 1} of {snap['total']}"
+    return fraction, status
+
+def cancel_jobs(jobs):
+    for job in jobs:
+        job.cancel()
+
+@st.fragment(run_every=JOB_POLL_SECONDS)
+def render_job_progress(jobs_key: str, title: str):
+    """
+    Live progress of the session's background jobs (a dict of name -> Job),
+    refreshed on a timer without rerunning the page; a full rerun picks up
+    the results once every job has finished.
+    """
+    jobs = st.session_state.get(jobs_key) or {}
+    if not jobs:
+        return
+    if all(job.finished_running for job in jobs.values()):
+        st.rerun()
+    
+    snaps = {name: job.snapshot() for name, job in jobs.items()}
+    statuses = {name: job_status(jobs[name], snap) for name, snap in snaps.items()}
+    fraction = sum(f for f, _ in statuses.values()) / len(statuses)
+    elapsed = max(snap['elapsed'] for snap in snaps.values())
+    if len(jobs) == 1:
+        status = next(iter(statuses.values()))[1]
+    else:
+        finished = sum(job.finished_running for job in jobs.values())
+        running = sum(snap['state'] == 'running' for snap in snaps.values())
+        status = f"{finished} of {len(jobs)} done, {running} running"
     
-    for col in df_raw.columns:
-        # Perform inference
-        ser, bq_type, date_fmt = infer_column(df_raw[col], col)
-        
-        # Get non-null values for sampling
-        non_null_series = ser.dropna()
-        null_count = len(ser) - len(non_null_series)
-        
-        # Smart sampling: get 5-7 diverse sample values from different parts
-        num_samples = min(7, len(non_null_series))
-        sample_values = []
-        
-        if num_samples > 0:
-            if num_samples <= 3:
-                # If we have 3 or fewer non-null values, just take all of them
-                sample_values = non_null_series.head(num_samples).tolist()
-            else:
-                # Get diverse samples: first, middle, and last values
-                # First value
-                sample_values.append(non_null_series.iloc[0])
-                
-                # Middle values (spread out)
-                if num_samples >= 5:
-                    mid_start = len(non_null_series) // 4
-                    mid_end = 3 * len(non_null_series) // 4
-                    middle_indices = [
-                        mid_start,
-                        len(non_null_series) // 2,
-                        mid_end
-                    ]
-                    for idx in middle_indices:
-                        if len(sample_values) < num_samples:
-                            sample_values.append(non_null_series.iloc[idx])
-                
-                # Last value
-                if len(sample_values) < num_samples:
-                    sample_values.append(non_null_series.iloc[-1])
-                
-                # Fill remaining slots with evenly spaced values
-                if len(sample_values) < num_samples:
-                    remaining = num_samples - len(sample_values)
-                    step = max(1, len(non_null_series) // (remaining + 1))
-                    for i in range(1, remaining + 1):
-                        idx = i * step
-                        if idx < len(non_null_series) and len(sample_values) < num_samples:
-                            if non_null_series.iloc[idx] not in sample_values:
-                                sample_values.append(non_null_series.iloc[idx])
-                
-                # Remove duplicates while preserving order
-                seen = set()
-                unique_samples = []
-                for val in sample_values:
-                    if val not in seen:
-                        seen.add(val)
-                        unique_samples.append(val)
-                sample_values = unique_samples[:num_samples]
-        
-        # Format sample values for display
-        sample_display = []
-        for val in sample_values:
-            if isinstance(val, (int, float)):
-                sample_display.append(str(val))
-            elif isinstance(val, pd.Timestamp):
-                sample_display.append(val.strftime("%Y-%m-%d %H:%M:%S"))
-            else:
-                str_val = str(val)
-                # Truncate long strings
-                if len(str_val) > 30:
-                    str_val = str_val[:27] + "..."
-                sample_display.append(str_val)
-        
-        schema_info[col] = {
-            'type': bq_type,
-            'sample_values': sample_display,
-            'null_count': null_count,
-            'total_count': len(ser)
-        }
+    st.markdown(f'<h3>{title}</h3>', unsafe_allow_html=True)
+    st.progress(fraction, text=f"{status} · {elapsed:.0f}s elapsed")
     
-    return schema_info
+    col1, col2 = st.columns([4, 1])
+    with col1:
+        if len(jobs) > 1:
+            with st.expander("Progress per file"):
+                for name, (_, job_line) in statuses.items():
+                    st.markdown(f"**{name}** - {job_line}")
+        with st.expander("Stage timings"):
+            render_stage_timings([
+                (f"{name}: {stage}" if len(jobs) > 1 else stage, seconds)
+                for name, snap in snaps.items() for stage, seconds in snap['timings']
+            ])
+    with col2:
+        st.button("Cancel", key=f"cancel_{jobs_key}", use_container_width=True,
+                  disabled=all(job.cancel_requested for job in jobs.values()),
+                  on_click=cancel_jobs, args=(list(jobs.values()),))
+
+@st.cache_resource
+def get_parse_cache():
+    """One parse cache per server process, shared by all sessions"""
+    return ParseCache()
 
-def display_processing_results(temp_dir):
+@st.cache_resource
+def get_job_queue():
+    """One job queue (and worker pool) per server process, shared by all sessions"""
+    return JobQueue()
+
+def session_owner():
+    """Stable id of this browser session, used to tell its jobs apart on the shared queue"""
+    if 'session_owner' not in st.session_state:
+        st.session_state['session_owner'] = uuid.uuid4().hex
+    return st.session_state['session_owner']
+
+def display_processing_results(bundles):
     """Display processing results in a user-friendly format"""
     
-    output_dir = Path(temp_dir)
-    if not output_dir.exists():
+    if bundles is None:
         st.markdown("""
         <div class="error-box">
             <strong>❌ Error</strong><br>
-            No output directory found
+            No processing output found
         </div>
         """, unsafe_allow_html=True)
         return
     
-    csv_files = list(output_dir.glob("*.csv"))
-    schema_json_files = list(output_dir.glob("*_bq_schema.json"))
-    summary_files = list(output_dir.glob("*_summary.txt"))
+    output_names = bundles.namelist()
+    csv_files = [name for name in output_names if name.endswith(".csv")]
+    schema_json_files = [name for name in output_names if name.endswith("_bq_schema.json")]
+    summary_files = [name for name in output_names if name.endswith("_summary.txt")]
     
     st.markdown('<h2>Processing Summary</h2>', unsafe_allow_html=True)
     col1, col2, col3 = st.columns(3)
@@ -1892,22 +2023,20 @@ def display_processing_results(temp_dir):
     st.markdown('<h2>Processed Files</h2>', unsafe_allow_html=True)
     
     for csv_file in csv_files:
-        sheet_name = csv_file.stem
-        schema_json_file = output_dir / f"{sheet_name}_bq_schema.json"
-        summary_file = output_dir / f"{sheet_name}_summary.txt"
+        sheet_name = Path(csv_file).stem
+        schema_json_file = f"{sheet_name}_bq_schema.json"
+        summary_file = f"{sheet_name}_summary.txt"
         
         with st.expander(f"Sheet: {sheet_name}", expanded=len(csv_files) == 1):
             
-            if schema_json_file.exists():
-                with open(schema_json_file, 'r', encoding='utf-8') as f:
-                    schema = json.load(f)
+            if schema_json_file in output_names:
+                schema = json.loads(bundles.read(schema_json_file))
                 
                 st.markdown('<h3>🗂️ BigQuery Schema (JSON)</h3>', unsafe_allow_html=True)
                 st.json(schema)
             
-            if summary_file.exists():
-                with open(summary_file, 'r', encoding='utf-8') as f:
-                    summary_content = f.read()
+            if summary_file in output_names:
+                summary_content = bundles.read(summary_file).decode('utf-8')
                 
                 st.markdown('<h3>📝 Column Summary</h3>', unsafe_allow_html=True)
                 st.markdown(f"""
@@ -1917,7 +2046,8 @@ def display_processing_results(temp_dir):
                 """, unsafe_allow_html=True)
             
             try:
-                df = pd.read_csv(csv_file, nrows=5)
+                with bundles.open_entry(csv_file) as f:
+                    df = pd.read_csv(f, nrows=5)
                 st.markdown('<h3>📊 Data Preview (First 5 rows)</h3>', unsafe_allow_html=True)
                 st.dataframe(df, use_container_width=True)
             except Exception as e:
@@ -1928,6 +2058,428 @@ def display_processing_results(temp_dir):
                 </div>
                 """, unsafe_allow_html=True)
 
+@st.fragment
+def render_schema_review():
+    """
+    Sheet picker, schema editor and process button. Runs as a fragment, so
+    edits only rerun this section; processing triggers a full rerun.
+    """
+    st.markdown("---")
+    st.markdown('<h2>Schema Review</h2>', unsafe_allow_html=True)
+    
+    # Schemas are reviewed per layout: sheets with identical headers (e.g. a batch
+    # of monthly files) share one schema, named after the first of them
+    sheet_layouts = st.session_state.get('sheet_layouts', {})
+    sheet_names = list(sheet_layouts)
+    inferred_schemas = st.session_state.get('inferred_schemas', {})
+    
+    def layout_title(layout):
+        others = len(sheet_layouts.get(layout, [])) - 1
+        return f"{layout} (+{others} more with the same columns)" if others > 0 else layout
+    
+    # Sheet selection dropdown (only show if multiple layouts)
+    if len(sheet_names) > 1:
+        st.markdown("""
+        <div class="info-text" style="margin-bottom: 1.5rem;">
+            <p><span style="color: #dc2626; font-size: 1.2rem; margin-right: 0.5rem;">⚠️</span>This upload contains multiple sheets. Select a sheet below to review and edit its schema; sheets with identical columns are reviewed together.</p>
+        </div>
+        """, unsafe_allow_html=True)
+        
+        selected_sheet = st.selectbox(
+            "Select Sheet to Review",
+            sheet_names,
+            key="sheet_selector",
+            format_func=layout_title,
+            index=sheet_names.index(st.session_state.get('selected_sheet', sheet_names[0])) if st.session_state.get('selected_sheet') in sheet_names else 0
+        )
+        st.session_state['selected_sheet'] = selected_sheet
+    else:
+        # Single sheet - use the only sheet name
+        selected_sheet = sheet_names[0] if sheet_names else None
+        st.session_state['selected_sheet'] = selected_sheet
+        st.markdown("""
+        <div class="info-text" style="margin-bottom: 1.5rem;">
+            <p>Review and edit the inferred data types below. You can change any column type before processing.</p>
+        </div>
+        """, unsafe_allow_html=True)
+    
+    if selected_sheet and selected_sheet in inferred_schemas:
+        schema_info = inferred_schemas[selected_sheet]
+        type_options = ["STRING", "INT64", "FLOAT64", "BOOL", "DATE", "TIMESTAMP"]
+        
+        # Initialize user-selected types structure if not exists
+        if 'user_selected_types' not in st.session_state:
+            st.session_state['user_selected_types'] = {}
+        
+        # Initialize user-selected types for this sheet if not exists
+        if selected_sheet not in st.session_state['user_selected_types']:
+            st.session_state['user_selected_types'][selected_sheet] = {
+                col: info['type'] for col, info in schema_info.items()
+            }
+        else:
+            # Update user_selected_types for this sheet to match current schema (add new columns, remove old ones)
+            current_types = st.session_state['user_selected_types'][selected_sheet]
+            new_types = {}
+            for col, info in schema_info.items():
+                # Use existing selection if column exists, otherwise use inferred type
+                new_types[col] = current_types.get(col, info['type'])
+            st.session_state['user_selected_types'][selected_sheet] = new_types
+        
+        # Bulk action: set every column whose name matches a pattern to one type
+        with st.form(key=f"bulk_type_form_{selected_sheet}", border=False):
+            bulk_col1, bulk_col2, bulk_col3 = st.columns([3, 1.5, 1.5], vertical_alignment="bottom")
+            with bulk_col1:
+                bulk_pattern = st.text_input(
+                    "Column name pattern",
+                    placeholder="e.g. *_id, date_*, * (all columns)",
+                    help="Shell-style wildcards, case-insensitive"
+                )
+            with bulk_col2:
+                bulk_type = st.selectbox("Set type", type_options + ["Inferred"])
+            with bulk_col3:
+                bulk_apply = st.form_submit_button("Apply to matching columns", use_container_width=True)
+        
+        if bulk_apply and bulk_pattern.strip():
+            sheet_types = st.session_state['user_selected_types'][selected_sheet]
+            matched = 0
+            for col_name, col_info in schema_info.items():
+                if fnmatch.fnmatch(str(col_name).lower(), bulk_pattern.strip().lower()):
+                    sheet_types[col_name] = col_info['type'] if bulk_type == "Inferred" else bulk_type
+                    matched += 1
+            # New editor version so the table starts from the updated types
+            editor_versions = st.session_state.setdefault('schema_editor_versions', {})
+            editor_versions[selected_sheet] = editor_versions.get(selected_sheet, 0) + 1
+            st.session_state.setdefault('schema_editor_bases', {}).pop(selected_sheet, None)
+            st.caption(f"Set {matched} column(s) matching '{bulk_pattern.strip()}' to {bulk_type}.")
+        
+        # The editor is fed a snapshot of the selections taken when it was
+        # (re)created; its own edit state carries later changes, so the widget
+        # stays stable across reruns instead of remounting on every edit
+        editor_bases = st.session_state.setdefault('schema_editor_bases', {})
+        if selected_sheet not in editor_bases:
+            editor_bases[selected_sheet] = dict(st.session_state['user_selected_types'][selected_sheet])
+        base_types = editor_bases[selected_sheet]
+        
+        # Create schema review table
+        review_data = []
+        for col_name, col_info in schema_info.items():
+            inferred_type = col_info['type']
+            sample_vals = col_info.get('sample_values', [])
+            null_count = col_info.get('null_count', 0)
+            
+            # Build sample display with null indicator if needed
+            if sample_vals:
+                sample_display = ", ".join(sample_vals)
+                if len(sample_display) > 50:
+                    sample_display = sample_display[:47] + "..."
+            else:
+                sample_display = "(no data)"
+            
+            # Add null count indicator if there are nulls
+            if null_count > 0:
+                sample_display = f"{sample_display} ({null_count} null)"
+            
+            review_data.append({
+                'Column Name': str(col_name),
+                'Inferred Type': inferred_type,
+                'Selected Type': base_types.get(col_name, inferred_type),
+                'Sample Values': sample_display
+            })
+        
+        review_df = pd.DataFrame(review_data, columns=['Column Name', 'Inferred Type', 'Selected Type', 'Sample Values'])
+        
+        # Show sheet name if multiple sheets
+        members = sheet_layouts.get(selected_sheet, [selected_sheet])
+        if len(sheet_names) > 1 or len(members) > 1:
+            st.markdown(f'<h3 style="margin-top: 0; margin-bottom: 1rem;">Sheet: <strong>{layout_title(selected_sheet)}</strong></h3>', unsafe_allow_html=True)
+        if len(members) > 1:
+            listed = ", ".join(members[:10]) + (f", ... ({len(members)} in total)" if len(members) > 10 else "")
+            st.caption(f"This schema applies to: {listed}")
+        profile_name = st.session_state.get('layout_profiles', {}).get(selected_sheet)
+        if profile_name:
+            st.caption(f"Types from the saved profile '{profile_name}' (no inference was run).")
+        
+        # One editable table instead of a widget per column, so wide sheets stay responsive
+        editor_version = st.session_state.get('schema_editor_versions', {}).get(selected_sheet, 0)
+        edited_df = st.data_editor(
+            review_df,
+            key=f"schema_editor_{selected_sheet}_{editor_version}",
+            column_config={
+                'Column Name': st.column_config.TextColumn(width="medium"),
+                'Inferred Type': st.column_config.TextColumn(width="small"),
+                'Selected Type': st.column_config.SelectboxColumn(
+                    options=type_options,
+                    required=True,
+                    width="small",
+                    help="BigQuery type used when processing"
+                ),
+                'Sample Values': st.column_config.TextColumn(width="large"),
+            },
+            disabled=['Column Name', 'Inferred Type', 'Sample Values'],
+            hide_index=True,
+            num_rows="fixed",
+            use_container_width=True,
+            height=min(600, 35 * (len(review_df) + 1) + 3)
+        )
+        
+        # Update the user_selected_types for this specific sheet
+        st.session_state['user_selected_types'][selected_sheet] = dict(
+            zip(schema_info.keys(), edited_df['Selected Type'])
+        )
+        
+        # Pre-flight check: would these types still load into the existing table?
+        with st.expander("Check against an existing BigQuery schema"):
+            expected_file = st.file_uploader(
+                "Upload the table's _bq_schema.json",
+                type=['json'],
+                key=f"drift_schema_{selected_sheet}",
+                help="Reports columns added, removed or retyped compared with the selected types above"
+            )
+            if expected_file is not None:
+                try:
+                    fields = json.load(expected_file)
+                    expected = {field['name']: field['type'].upper() for field in fields} if isinstance(fields, list) else None
+                except (ValueError, KeyError, TypeError, AttributeError):
+                    expected = None
+                if expected is None:
+                    st.error("This file is not a BigQuery JSON schema (a list of fields with name and type).")
+                else:
+                    report = compare(selected_sheet, expected, st.session_state['user_selected_types'][selected_sheet], expected_file.name)
+                    if report.ok:
+                        st.markdown(f"""
+                        <div class="success-box">
+                            <strong>✅ No Drift</strong><br>
+                            Columns and types match {expected_file.name}.
+                        </div>
+                        """, unsafe_allow_html=True)
+                    else:
+                        details = "".join(
+                            f"<li>{label}: {', '.join(items)}</li>"
+                            for label, items in (
+                                ("Added", report.added),
+                                ("Removed", report.removed),
+                                ("Retyped", [f"{col} ({old} → {new})" for col, old, new in report.retyped]),
+                            ) if items
+                        )
+                        st.markdown(f"""
+                        <div class="error-box">
+                            <strong>❌ Schema Drift</strong><br>
+                            Compared with {expected_file.name}:
+                            <ul>{details}</ul>
+                        </div>
+                        """, unsafe_allow_html=True)
+        
+        # Save the reviewed types so later files with these exact columns skip inference
+        with st.form(key=f"save_profile_form_{selected_sheet}", border=False):
+            profile_col1, profile_col2 = st.columns([4.5, 1.5], vertical_alignment="bottom")
+            with profile_col1:
+                new_profile_name = st.text_input(
+                    "Save as profile",
+                    value=profile_name or selected_sheet,
+                    help="Files whose header row matches this sheet exactly will use these types without inference"
+                )
+            with profile_col2:
+                save_profile_btn = st.form_submit_button("Save profile", use_container_width=True)
+        
+        if save_profile_btn and new_profile_name.strip():
+            save_profile(
+                new_profile_name.strip(),
+                st.session_state['layout_signatures'][selected_sheet],
+                st.session_state['user_selected_types'][selected_sheet]
+            )
+            st.session_state.setdefault('layout_profiles', {})[selected_sheet] = new_profile_name.strip()
+            st.caption(f"Saved profile '{new_profile_name.strip()}'.")
+    
+    # Process with schema button
+    st.markdown("---")
+    process_with_schema_btn = st.button("Process with this schema", type="primary", use_container_width=True, key="process_with_schema")
+    
+    if process_with_schema_btn:
+        # The sheets were already parsed for the schema review, so reuse them.
+        # Every file is processed by its own job on the shared queue; workers
+        # compress the outputs once and hand back the entries for one bundle.
+        start_processing()
+        st.rerun()
+
+@st.fragment
+def render_processing_results(output_bundles):
+    """Success notice and per-sheet previews, rerun on their own as a fragment"""
+    cancelled = st.session_state.get('processing_cancelled')
+    if cancelled:
+        st.markdown(f"""
+        <div class="success-box">
+            <strong>⚠️ Processing Cancelled</strong><br>
+            Results for the {cancelled[0]} of {cancelled[1]} sheet(s) completed before cancelling are available below.
+        </div>
+        """, unsafe_allow_html=True)
+    else:
+        st.markdown("""
+        <div class="success-box">
+            <strong>✅ Processing Completed Successfully!</strong><br>
+            Your data has been processed and is now BigQuery-ready.
+        </div>
+        """, unsafe_allow_html=True)
+    
+    if st.session_state.get('processing_timings'):
+        with st.expander("Processing stage timings"):
+            render_stage_timings(st.session_state['processing_timings'])
+    
+    display_processing_results(output_bundles)
+
+@st.fragment
+def render_downloads(output_bundles):
+    """Individual and bulk download buttons, rerun on their own as a fragment"""
+    st.markdown("---")
+    st.markdown('<h2>Download Results</h2>', unsafe_allow_html=True)
+    
+    base_name = st.session_state.get('uploaded_file_name', 'processed').split('.')[0]
+    # Individual file downloads section - Grouped by sheet. Each button gets
+    # a callable, so a file is only decompressed and sent when clicked and
+    # reruns don't push every output through the media store again.
+    st.markdown('<h3>Individual File Downloads</h3>', unsafe_allow_html=True)
+    
+    # Get all files from the output bundles
+    output_files_list = [Path(name) for name in output_bundles.namelist()]
+    
+    # Group files by sheet name
+    # Extract sheet name from filename (e.g., "Sheet1.csv" -> "Sheet1")
+    files_by_sheet = {}
+    for file_path in output_files_list:
+        # Remove extension and any suffix like "_bq_schema" or "_summary"
+        base_name = file_path.stem
+        # Remove known suffixes
+        for suffix in ['_bq_schema', '_summary']:
+            if base_name.endswith(suffix):
+                base_name = base_name[:-len(suffix)]
+        
+        if base_name not in files_by_sheet:
+            files_by_sheet[base_name] = []
+        files_by_sheet[base_name].append(file_path)
+    
+    # Sort sheets and files within each sheet
+    for sheet_name in files_by_sheet:
+        files_by_sheet[sheet_name].sort(key=lambda x: x.name)
+    
+    # Display files grouped by sheet
+    for sheet_name in sorted(files_by_sheet.keys()):
+        sheet_files = files_by_sheet[sheet_name]
+        
+        # Show sheet name header if multiple sheets
+        sheet_names = st.session_state.get('sheet_names', [])
+        if len(sheet_names) > 1:
+            st.markdown(f'<h4 style="margin-top: 1.5rem; margin-bottom: 0.75rem; color: #177091; font-size: 1.1rem;">Sheet: {sheet_name}</h4>', unsafe_allow_html=True)
+        
+        # Group files by type for this sheet
+        csv_files = [f for f in sheet_files if f.suffix.lower() == '.csv']
+        schema_json_files = [f for f in sheet_files if '_bq_schema.json' in f.name]
+        summary_files = [f for f in sheet_files if '_summary.txt' in f.name]
+        
+        # Display CSV file
+        if csv_files:
+            num_cols = min(4, len(csv_files))
+            cols = st.columns(num_cols, gap="small")
+            for idx, file_path in enumerate(csv_files):
+                relative_path_str = str(file_path)
+                if output_bundles.size(relative_path_str):
+                    with cols[idx % len(cols)]:
+                        display_name = "Cleaned CSV" if len(csv_files) == 1 else file_path.name
+                        if len(display_name) > 25:
+                            display_name = display_name[:22] + "..."
+                        st.download_button(
+                            label=display_name,
+                            data=lambda name=relative_path_str: output_bundles.read(name),
+                            file_name=file_path.name,
+                            mime="text/csv",
+                            key=f"csv_{sheet_name}_{file_path.name}_{idx}",
+                            use_container_width=True,
+                            on_click="ignore"
+                        )
+        
+        # Display Schema JSON file
+        if schema_json_files:
+            num_cols = min(4, len(schema_json_files))
+            cols = st.columns(num_cols, gap="small")
+            for idx, file_path in enumerate(schema_json_files):
+                relative_path_str = str(file_path)
+                if output_bundles.size(relative_path_str):
+                    with cols[idx % len(cols)]:
+                        display_name = "Schema (JSON)" if len(schema_json_files) == 1 else file_path.name
+                        if len(display_name) > 25:
+                            display_name = display_name[:22] + "..."
+                        st.download_button(
+                            label=display_name,
+                            data=lambda name=relative_path_str: output_bundles.read(name),
+                            file_name=file_path.name,
+                            mime="application/json",
+                            key=f"schema_json_{sheet_name}_{file_path.name}_{idx}",
+                            use_container_width=True,
+                            on_click="ignore"
+                        )
+        
+        # Display Summary file
+        if summary_files:
+            num_cols = min(4, len(summary_files))
+            cols = st.columns(num_cols, gap="small")
+            for idx, file_path in enumerate(summary_files):
+                relative_path_str = str(file_path)
+                if output_bundles.size(relative_path_str):
+                    with cols[idx % len(cols)]:
+                        display_name = "Summary" if len(summary_files) == 1 else file_path.name
+                        if len(display_name) > 25:
+                            display_name = display_name[:22] + "..."
+                        st.download_button(
+                            label=display_name,
+                            data=lambda name=relative_path_str: output_bundles.read(name),
+                            file_name=file_path.name,
+                            mime="text/plain",
+                            key=f"summary_{sheet_name}_{file_path.name}_{idx}",
+                            use_container_width=True,
+                            on_click="ignore"
+                        )
+    
+    # Bulk download buttons: the ZIPs are only assembled when a button is
+    # clicked (callable data) and memoized by the run's BundleBuilder
+    st.markdown("---")
+    st.markdown('<h3>Bulk Downloads</h3>', unsafe_allow_html=True)
+    # Center the three buttons with spacer columns
+    col_spacer1, col1, col2, col3, col_spacer2 = st.columns([1, 1.5, 1.5, 1.5, 1])
+    
+    with col1:
+        st.download_button(
+            label="Download CSV Files",
+            data=lambda: create_csv_zip(output_bundles),
+            file_name=f"{base_name}_csv_files.zip",
+            mime="application/zip",
+            help="Download all processed CSV files",
+            use_container_width=True,
+            key=f"bulk_csv_{base_name}",
+            on_click="ignore"
+        )
+    
+    with col2:
+        st.download_button(
+            label="Download Schema (JSON)",
+            data=lambda: create_schema_zip(output_bundles),
+            file_name=f"{base_name}_schemas_json.zip",
+            mime="application/zip",
+            help="Download all BigQuery schema JSON files",
+            use_container_width=True,
+            key=f"bulk_schema_json_{base_name}",
+            on_click="ignore"
+        )
+    
+    with col3:
+        st.download_button(
+            label="Download All (ZIP)",
+            data=lambda: create_download_zip(output_bundles),
+            file_name=f"{base_name}_all_files.zip",
+            mime="application/zip",
+            help="Download all processed files including CSV, JSON schema, and summary files",
+            use_container_width=True,
+            key=f"bulk_all_{base_name}",
+            on_click="ignore"
+        )
+
 def run_main_app():
     """
     Main application functionality.
@@ -1976,8 +2528,8 @@ def run_main_app():
     <div class="important-notice">
         <h3>⚠️ Important Information</h3>
         <ul>
-            <li><strong>Single User Access:</strong> Only one user can access the app at a time</li>
-            <li><strong>One File at a Time:</strong> One file can be uploaded at a time. Multiple files cannot be uploaded</li>
+            <li><strong>Shared Processing Queue:</strong> Several users can work at the same time; when the server is busy, your job waits in the queue and shows its position</li>
+            <li><strong>Batch Uploads:</strong> Select several files at once; sheets with identical columns share one schema review, and all files are processed in parallel into one download</li>
             <li><strong>Schema Review:</strong> Choose the data schema correctly before processing the file</li>
         </ul>
     </div>
@@ -1985,530 +2537,148 @@ def run_main_app():
     
     # File upload section
     st.markdown("---")
-    st.markdown('<h2 style="display: inline-flex; align-items: center;">Upload Your Data File <span class="upload-alert">Max upload size: 200MB</span></h2>', unsafe_allow_html=True)
+    st.markdown('<h2 style="display: inline-flex; align-items: center;">Upload Your Data Files <span class="upload-alert">Max upload size: 200MB per file</span></h2>', unsafe_allow_html=True)
+    
+    # Large extracts already on the app host can be picked by path instead of uploaded
+    server_data_dir = get_server_data_dir()
+    source = "Upload files"
+    if server_data_dir is not None:
+        source = st.radio(
+            "Source",
+            ["Upload files", "Files on the server"],
+            horizontal=True,
+            label_visibility="collapsed"
+        )
     
-    uploaded_file = st.file_uploader(
-        "Choose an Excel (.xlsx, .xls) or CSV file",
-        type=['xlsx', 'xls', 'csv'],
-        help="Maximum file size: 200MB",
-        label_visibility="collapsed"
-    )
+    if source == "Files on the server":
+        server_files = {f.name: f for f in list_server_files(server_data_dir)}
+        selected_paths = st.multiselect(
+            "Choose files on the server",
+            list(server_files),
+            format_func=lambda name: f"{name} ({server_files[name].size / (1024 * 1024):.1f}MB)",
+            help=f"Files under {server_data_dir}. They are read in place, so the upload size limit does not apply",
+            label_visibility="collapsed"
+        )
+        uploaded_files = [server_files[name] for name in selected_paths]
+    else:
+        uploaded_files = st.file_uploader(
+            "Choose Excel (.xlsx, .xls) or CSV files",
+            type=['xlsx', 'xls', 'csv'],
+            accept_multiple_files=True,
+            help="Maximum file size: 200MB per file. Select several files to process a batch together",
+            label_visibility="collapsed"
+        )
     
     # Clear session state if file uploader is cleared (user clicked X button)
-    if uploaded_file is None:
+    if not uploaded_files:
         # Check if we had a file before (session state exists)
         if 'uploaded_file_name' in st.session_state:
-            # User cleared the file, so clear all session state
+            # User cleared the files, so stop their jobs and clear all session state
+            cancel_session_jobs()
             keys_to_clear = [
-                'uploaded_file_name', 'schema_review_done', 'inferred_schemas',
-                'raw_dataframes', 'processed', 'output_files', 'user_selected_types',
-                'sheet_names', 'selected_sheet'
+                'uploaded_file_name', 'upload_signature', 'schema_review_done', 'inferred_schemas',
+                'raw_dataframes', 'sheet_sources', 'processed', 'output_bundles', 'user_selected_types',
+                'layout_signatures', 'layout_profiles',
+                'schema_editor_bases', 'schema_editor_versions', 'sheet_names', 'sheet_layouts',
+                'selected_sheet', 'file_sheets', 'read_results', 'read_jobs', 'read_cache_keys',
+                'layout_cache_keys', 'infer_jobs', 'processing_jobs', 'processing_timings',
+                'processing_cancelled'
             ]
             for key in keys_to_clear:
                 if key in st.session_state:
                     del st.session_state[key]
     
-    if uploaded_file is not None:
-        file_size_mb = len(uploaded_file.getvalue()) / (1024 * 1024)
+    if uploaded_files:
+        for uploaded_file in uploaded_files:
+            file_size_mb = uploaded_file.size / (1024 * 1024)
+            if file_size_mb > 200 and not isinstance(uploaded_file, ServerFile):
+                st.markdown(f"""
+                <div class="error-box">
+                    <strong>❌ File Size Error</strong><br>
+                    {uploaded_file.name} ({file_size_mb:.1f}MB) exceeds the 200MB limit. Please upload a smaller file.
+                </div>
+                """, unsafe_allow_html=True)
+                return
+            if uploaded_file.name.split('.')[-1].lower() not in {'xlsx', 'xlsm', 'xls', 'csv'}:
+                st.error(f"Unsupported file type: {uploaded_file.name}. Please upload .xlsx, .xls, or .csv files.")
+                return
         
-        if file_size_mb > 200:
-            st.markdown(f"""
-            <div class="error-box">
-                <strong>❌ File Size Error</strong><br>
-                File size ({file_size_mb:.1f}MB) exceeds the 200MB limit. Please upload a smaller file.
-            </div>
-            """, unsafe_allow_html=True)
-            return
+        # Check if this is a new upload (different files from the previous one)
+        upload_signature = tuple((f.name, f.size) for f in uploaded_files)
+        is_new_file = st.session_state.get('upload_signature') != upload_signature
         
-        # Check if this is a new file (different from previous upload)
-        is_new_file = (
-            'uploaded_file_name' not in st.session_state or 
-            st.session_state.get('uploaded_file_name') != uploaded_file.name
-        )
-        
-        # Clear all previous session state when a new file is uploaded
+        # Clear all previous session state when new files are uploaded
         if is_new_file:
+            cancel_session_jobs()
+            st.session_state['read_results'] = {}
+            st.session_state['read_jobs'] = {}
+            st.session_state['read_cache_keys'] = {}
+            st.session_state['layout_cache_keys'] = {}
+            st.session_state['infer_jobs'] = {}
+            st.session_state['processing_jobs'] = {}
+            st.session_state['processing_timings'] = []
+            st.session_state['processing_cancelled'] = None
             st.session_state['schema_review_done'] = False
             st.session_state['inferred_schemas'] = {}
             st.session_state['raw_dataframes'] = {}
+            st.session_state['sheet_sources'] = {}
             st.session_state['processed'] = False
-            st.session_state['output_files'] = {}
+            st.session_state['output_bundles'] = None
             st.session_state['user_selected_types'] = {}
+            st.session_state['schema_editor_bases'] = {}
+            st.session_state['schema_editor_versions'] = {}
             st.session_state['sheet_names'] = []
+            st.session_state['sheet_layouts'] = {}
+            st.session_state['layout_signatures'] = {}
+            st.session_state['layout_profiles'] = {}
+            st.session_state['file_sheets'] = {}
             st.session_state['selected_sheet'] = None
-            st.session_state['uploaded_file_name'] = uploaded_file.name
-        
+            st.session_state['upload_signature'] = upload_signature
+            st.session_state['uploaded_file_name'] = (
+                uploaded_files[0].name if len(uploaded_files) == 1 else f"batch_{len(uploaded_files)}_files"
+            )
+        
+        total_size_mb = sum(f.size for f in uploaded_files) / (1024 * 1024)
+        if len(uploaded_files) == 1:
+            file_line = f"<strong>📄 File:</strong> {uploaded_files[0].name}<br>"
+        else:
+            file_line = f"<strong>📄 Files:</strong> {len(uploaded_files)} files ({', '.join(f.name for f in uploaded_files[:5])}{', ...' if len(uploaded_files) > 5 else ''})<br>"
         st.markdown(f"""
         <div class="file-info">
-            <strong>📄 File:</strong> {uploaded_file.name}<br>
-            <strong>📊 Size:</strong> {file_size_mb:.2f} MB<br>
+            {file_line}
+            <strong>📊 Size:</strong> {total_size_mb:.2f} MB<br>
             <strong>✅ Status:</strong> Ready to process
         </div>
         """, unsafe_allow_html=True)
         
-        # Perform initial inference if not done yet
-        if not st.session_state.get('schema_review_done', False) or st.session_state.get('uploaded_file_name') != uploaded_file.name:
-            with st.spinner("Analyzing your file and inferring data types for all sheets..."):
-                try:
-                    # Load the file
-                    file_ext = uploaded_file.name.split('.')[-1].lower()
-                    
-                    inferred_schemas = {}
-                    raw_dataframes = {}
-                    sheet_names = []
-                    
-                    if file_ext in {'xlsx', 'xlsm', 'xls'}:
-                        # For Excel, read all sheets
-                        uploaded_file.seek(0)
-                        all_sheets = pd.read_excel(
-                            uploaded_file,
-                            sheet_name=None,
-                            dtype=str,
-                            keep_default_na=False,
-                            engine="openpyxl"
-                        )
-                        
-                        # Run inference for each sheet
-                        for sheet_name, df_raw in all_sheets.items():
-                            sheet_names.append(sheet_name)
-                            raw_dataframes[sheet_name] = df_raw
-                            schema_info = perform_initial_inference(df_raw.copy())
-                            inferred_schemas[sheet_name] = schema_info
-                        
-                    elif file_ext == 'csv':
-                        # For CSV, treat as single sheet
-                        uploaded_file.seek(0)
-                        df_raw = pd.read_csv(uploaded_file, dtype=str, keep_default_na=False, engine="python", on_bad_lines="skip")
-                        sheet_name = uploaded_file.name.split('.')[0]  # Use filename without extension as sheet name
-                        sheet_names = [sheet_name]
-                        raw_dataframes[sheet_name] = df_raw
-                        schema_info = perform_initial_inference(df_raw.copy())
-                        inferred_schemas[sheet_name] = schema_info
-                    else:
-                        st.error("Unsupported file type. Please upload .xlsx, .xls, or .csv files.")
-                        return
-                    
-                    st.session_state['inferred_schemas'] = inferred_schemas
-                    st.session_state['raw_dataframes'] = raw_dataframes
-                    st.session_state['sheet_names'] = sheet_names
-                    # Set first sheet as selected by default
-                    if sheet_names:
-                        st.session_state['selected_sheet'] = sheet_names[0]
-                    st.session_state['uploaded_file_name'] = uploaded_file.name
-                    
-                except Exception as e:
-                    st.markdown(f"""
-                    <div class="error-box">
-                        <strong>❌ File Analysis Failed</strong><br>
-                        {str(e)}
-                    </div>
-                    """, unsafe_allow_html=True)
-                    st.exception(e)
-                    return
+        # Perform initial inference if not done yet: read every file, group the sheets
+        # by header layout, then infer each layout once. Both steps reuse cached results
+        # for the same bytes and settings, otherwise they run as background jobs
+        if not st.session_state.get('inferred_schemas'):
+            if not analyze_uploads(uploaded_files):
+                render_shared_footer()
+                return
+        
+        # Pick up finished processing jobs: completed (or, after a cancel, the
+        # sheets that finished) become the results
+        processing_jobs = st.session_state.get('processing_jobs') or {}
+        if processing_jobs and all(job.finished_running for job in processing_jobs.values()):
+            finish_processing(processing_jobs)
+        elif processing_jobs:
+            render_job_progress('processing_jobs', "Processing your files with the selected schemas...")
+            render_shared_footer()
+            return
         
         # Display Schema Review Table
         if st.session_state.get('inferred_schemas') and not st.session_state.get('processed', False):
-            st.markdown("---")
-            st.markdown('<h2>Schema Review</h2>', unsafe_allow_html=True)
-            
-            sheet_names = st.session_state.get('sheet_names', [])
-            inferred_schemas = st.session_state.get('inferred_schemas', {})
-            
-            # Sheet selection dropdown (only show if multiple sheets)
-            if len(sheet_names) > 1:
-                st.markdown("""
-                <div class="info-text" style="margin-bottom: 1.5rem;">
-                    <p><span style="color: #dc2626; font-size: 1.2rem; margin-right: 0.5rem;">⚠️</span>This file contains multiple sheets. Select a sheet below to review and edit its schema.</p>
-                </div>
-                """, unsafe_allow_html=True)
-                
-                selected_sheet = st.selectbox(
-                    "Select Sheet to Review",
-                    sheet_names,
-                    key="sheet_selector",
-                    index=sheet_names.index(st.session_state.get('selected_sheet', sheet_names[0])) if st.session_state.get('selected_sheet') in sheet_names else 0
-                )
-                st.session_state['selected_sheet'] = selected_sheet
-            else:
-                # Single sheet - use the only sheet name
-                selected_sheet = sheet_names[0] if sheet_names else None
-                st.session_state['selected_sheet'] = selected_sheet
-                st.markdown("""
-                <div class="info-text" style="margin-bottom: 1.5rem;">
-                    <p>Review and edit the inferred data types below. You can change any column type before processing.</p>
-                </div>
-                """, unsafe_allow_html=True)
-            
-            if selected_sheet and selected_sheet in inferred_schemas:
-                schema_info = inferred_schemas[selected_sheet]
-                type_options = ["STRING", "INT64", "FLOAT64", "BOOL", "DATE", "TIMESTAMP"]
-                
-                # Initialize user-selected types structure if not exists
-                if 'user_selected_types' not in st.session_state:
-                    st.session_state['user_selected_types'] = {}
-                
-                # Initialize user-selected types for this sheet if not exists
-                if selected_sheet not in st.session_state['user_selected_types']:
-                    st.session_state['user_selected_types'][selected_sheet] = {
-                        col: info['type'] for col, info in schema_info.items()
-                    }
-                else:
-                    # Update user_selected_types for this sheet to match current schema (add new columns, remove old ones)
-                    current_types = st.session_state['user_selected_types'][selected_sheet]
-                    new_types = {}
-                    for col, info in schema_info.items():
-                        # Use existing selection if column exists, otherwise use inferred type
-                        new_types[col] = current_types.get(col, info['type'])
-                    st.session_state['user_selected_types'][selected_sheet] = new_types
-                
-                # Create schema review table
-                review_data = []
-                for col_name, col_info in schema_info.items():
-                    inferred_type = col_info['type']
-                    sample_vals = col_info.get('sample_values', [])
-                    null_count = col_info.get('null_count', 0)
-                    total_count = col_info.get('total_count', 0)
-                    
-                    # Build sample display with null indicator if needed
-                    if sample_vals:
-                        sample_display = ", ".join(sample_vals)
-                        if len(sample_display) > 50:
-                            sample_display = sample_display[:47] + "..."
-                    else:
-                        sample_display = "(no data)"
-                    
-                    # Add null count indicator if there are nulls
-                    if null_count > 0:
-                        null_percentage = (null_count / total_count * 100) if total_count > 0 else 0
-                        null_indicator = f" <span style='color: #dc2626; font-size: 0.85rem;'>({null_count} null)</span>"
-                        sample_display = sample_display + null_indicator
-                    
-                    # Get current user selection for this sheet and column
-                    sheet_types = st.session_state['user_selected_types'].get(selected_sheet, {})
-                    current_selection = sheet_types.get(col_name, inferred_type)
-                    
-                    review_data.append({
-                        'Column Name': col_name,
-                        'Inferred Type': inferred_type,
-                        'Selected Type': current_selection,
-                        'Sample Values': sample_display
-                    })
-                
-                # Display as dataframe for better formatting
-                review_df = pd.DataFrame(review_data)
-                
-                # Show sheet name if multiple sheets
-                if len(sheet_names) > 1:
-                    st.markdown(f'<h3 style="margin-top: 0; margin-bottom: 1rem;">Sheet: <strong>{selected_sheet}</strong></h3>', unsafe_allow_html=True)
-                
-                # Create editable interface using columns with improved styling
-                st.markdown("""
-                <div class="schema-review-container">
-                """, unsafe_allow_html=True)
-                
-                # Display table with editable dropdowns
-                for idx, row in review_df.iterrows():
-                    col_name = row['Column Name']
-                    inferred_type = row['Inferred Type']
-                    sample_vals = row['Sample Values']
-                    
-                    # Add row styling
-                    st.markdown(f'<div class="schema-review-row">', unsafe_allow_html=True)
-                    
-                    col1, col2, col3, col4 = st.columns([2, 1.5, 1.5, 3])
-                    
-                    with col1:
-                        st.markdown(f'<div class="schema-column-name">{col_name}</div>', unsafe_allow_html=True)
-                    
-                    with col2:
-                        st.markdown(f'<span class="schema-inferred-type">{inferred_type}</span>', unsafe_allow_html=True)
-                    
-                    with col3:
-                        sheet_types = st.session_state['user_selected_types'].get(selected_sheet, {})
-                        current_type = sheet_types.get(col_name, inferred_type)
-                        try:
-                            default_index = type_options.index(current_type)
-                        except ValueError:
-                            # If current type is not in options, default to inferred type
-                            default_index = type_options.index(inferred_type) if inferred_type in type_options else 0
-                        
-                        selected_type = st.selectbox(
-                            f"Type for {col_name}",
-                            type_options,
-                            index=default_index,
-                            key=f"type_select_{selected_sheet}_{col_name}",
-                            label_visibility="collapsed"
-                        )
-                        # Update the user_selected_types for this specific sheet
-                        if selected_sheet not in st.session_state['user_selected_types']:
-                            st.session_state['user_selected_types'][selected_sheet] = {}
-                        st.session_state['user_selected_types'][selected_sheet][col_name] = selected_type
-                    
-                    with col4:
-                        st.markdown(f'<div class="schema-sample-values">{sample_vals}</div>', unsafe_allow_html=True)
-                    
-                    st.markdown('</div>', unsafe_allow_html=True)
-                    
-                    if idx < len(review_df) - 1:
-                        st.markdown('<hr style="margin: 1rem 0; border: none; border-top: 1px solid #e5e7eb;">', unsafe_allow_html=True)
-                
-                st.markdown("</div>", unsafe_allow_html=True)
-            
-            # Process with schema button
-            st.markdown("---")
-            process_with_schema_btn = st.button("Process with this schema", type="primary", use_container_width=True, key="process_with_schema")
-            
-            if process_with_schema_btn:
-                with st.spinner("Processing your file with the selected schemas..."):
-                    try:
-                        with tempfile.TemporaryDirectory() as temp_dir:
-                            temp_dir = Path(temp_dir)
-                            
-                            input_path = temp_dir / uploaded_file.name
-                            # Reset file pointer
-                            uploaded_file.seek(0)
-                            with open(input_path, 'wb') as f:
-                                f.write(uploaded_file.getvalue())
-                            
-                            output_dir = temp_dir / "output"
-                            output_dir.mkdir()
-                            
-                            file_ext = input_path.suffix.lower()
-                            
-                            # Get user-selected types per sheet
-                            user_selected_types_all = st.session_state.get('user_selected_types', {})
-                            
-                            # Process with override_types per sheet
-                            if file_ext in {'.xlsx', '.xlsm', '.xls'}:
-                                # For Excel, process all sheets with their respective override_types
-                                sheets = pd.read_excel(
-                                    input_path,
-                                    sheet_name=None,
-                                    dtype=str,
-                                    keep_default_na=False,
-                                    engine="openpyxl"
-                                )
-                                for sheet_name, df_sheet in sheets.items():
-                                    # Get override_types for this specific sheet
-                                    override_types = user_selected_types_all.get(sheet_name, {})
-                                    process_sheet(sheet_name, df_sheet, output_dir, override_types=override_types)
-                            elif file_ext == '.csv':
-                                # For CSV, use the sheet name (filename without extension)
-                                sheet_name = input_path.stem
-                                df = pd.read_csv(input_path, dtype=str, keep_default_na=False, engine="python", on_bad_lines="skip")
-                                override_types = user_selected_types_all.get(sheet_name, {})
-                                process_sheet(sheet_name, df, output_dir, override_types=override_types)
-                            else:
-                                st.error("Unsupported file type. Please upload .xlsx, .xls, or .csv files.")
-                                return
-                            
-                            # Store output files
-                            st.session_state['output_files'] = {}
-                            for file_path in output_dir.rglob('*'):
-                                if file_path.is_file():
-                                    relative_path = file_path.relative_to(output_dir)
-                                    with open(file_path, 'rb') as f:
-                                        st.session_state['output_files'][str(relative_path)] = f.read()
-                            
-                            st.session_state['processed'] = True
-                            st.session_state['schema_review_done'] = True
-                            st.rerun()
-                    
-                    except Exception as e:
-                        st.markdown(f"""
-                        <div class="error-box">
-                            <strong>❌ Processing Failed</strong><br>
-                            {str(e)}
-                        </div>
-                        """, unsafe_allow_html=True)
-                        st.exception(e)
-                        st.session_state['processed'] = False
-                        
-        # Only show processed results if we have a file and it's been processed
-        if uploaded_file is not None and st.session_state.get('processed', False) and st.session_state.get('uploaded_file_name') == uploaded_file.name:
-            with tempfile.TemporaryDirectory() as display_temp_dir:
-                display_temp_dir = Path(display_temp_dir)
-                output_dir = display_temp_dir / "output"
-                output_dir.mkdir()
-                
-                for file_path_str, file_content in st.session_state.get('output_files', {}).items():
-                    file_path = output_dir / file_path_str
-                    file_path.parent.mkdir(parents=True, exist_ok=True)
-                    with open(file_path, 'wb') as f:
-                        f.write(file_content)
-                
-                st.markdown("""
-                <div class="success-box">
-                    <strong>✅ Processing Completed Successfully!</strong><br>
-                    Your data has been processed and is now BigQuery-ready.
-                </div>
-                """, unsafe_allow_html=True)
-                
-                display_processing_results(output_dir)
-                
-                st.markdown("---")
-                st.markdown('<h2>Download Results</h2>', unsafe_allow_html=True)
-                
-                base_name = st.session_state.get('uploaded_file_name', 'processed').split('.')[0]
-                
-                with tempfile.TemporaryDirectory() as zip_temp_dir:
-                    zip_temp_dir = Path(zip_temp_dir)
-                    zip_output_dir = zip_temp_dir / "output"
-                    zip_output_dir.mkdir()
-                    
-                    for file_path_str, file_content in st.session_state.get('output_files', {}).items():
-                        file_path = zip_output_dir / file_path_str
-                        file_path.parent.mkdir(parents=True, exist_ok=True)
-                        with open(file_path, 'wb') as f:
-                            f.write(file_content)
-                    
-                    csv_zip_data = create_csv_zip(zip_output_dir)
-                    schema_json_zip_data = create_schema_zip(zip_output_dir)
-                    summary_zip_data = create_summary_zip(zip_output_dir)
-                    all_zip_data = create_download_zip(zip_output_dir)
-                
-                # Individual file downloads section - Grouped by sheet
-                st.markdown('<h3>Individual File Downloads</h3>', unsafe_allow_html=True)
-                
-                # Get all files from output directory
-                output_files_list = []
-                for file_path_str in st.session_state.get('output_files', {}).keys():
-                    output_files_list.append(Path(file_path_str))
-                
-                # Group files by sheet name
-                # Extract sheet name from filename (e.g., "Sheet1.csv" -> "Sheet1")
-                files_by_sheet = {}
-                for file_path in output_files_list:
-                    # Remove extension and any suffix like "_bq_schema" or "_summary"
-                    base_name = file_path.stem
-                    # Remove known suffixes
-                    for suffix in ['_bq_schema', '_summary']:
-                        if base_name.endswith(suffix):
-                            base_name = base_name[:-len(suffix)]
-                    
-                    if base_name not in files_by_sheet:
-                        files_by_sheet[base_name] = []
-                    files_by_sheet[base_name].append(file_path)
-                
-                # Sort sheets and files within each sheet
-                for sheet_name in files_by_sheet:
-                    files_by_sheet[sheet_name].sort(key=lambda x: x.name)
-                
-                # Display files grouped by sheet
-                for sheet_name in sorted(files_by_sheet.keys()):
-                    sheet_files = files_by_sheet[sheet_name]
-                    
-                    # Show sheet name header if multiple sheets
-                    sheet_names = st.session_state.get('sheet_names', [])
-                    if len(sheet_names) > 1:
-                        st.markdown(f'<h4 style="margin-top: 1.5rem; margin-bottom: 0.75rem; color: #177091; font-size: 1.1rem;">Sheet: {sheet_name}</h4>', unsafe_allow_html=True)
-                    
-                    # Group files by type for this sheet
-                    csv_files = [f for f in sheet_files if f.suffix.lower() == '.csv']
-                    schema_json_files = [f for f in sheet_files if '_bq_schema.json' in f.name]
-                    summary_files = [f for f in sheet_files if '_summary.txt' in f.name]
-                    
-                    # Display CSV file
-                    if csv_files:
-                        num_cols = min(4, len(csv_files))
-                        cols = st.columns(num_cols, gap="small")
-                        for idx, file_path in enumerate(csv_files):
-                            relative_path_str = str(file_path)
-                            file_data = st.session_state.get('output_files', {}).get(relative_path_str, b'')
-                            if file_data:
-                                with cols[idx % len(cols)]:
-                                    display_name = "Cleaned CSV" if len(csv_files) == 1 else file_path.name
-                                    if len(display_name) > 25:
-                                        display_name = display_name[:22] + "..."
-                                    st.download_button(
-                                        label=display_name,
-                                        data=file_data,
-                                        file_name=file_path.name,
-                                        mime="text/csv",
-                                        key=f"csv_{sheet_name}_{file_path.name}_{idx}",
-                                        use_container_width=True
-                                    )
-                    
-                    # Display Schema JSON file
-                    if schema_json_files:
-                        num_cols = min(4, len(schema_json_files))
-                        cols = st.columns(num_cols, gap="small")
-                        for idx, file_path in enumerate(schema_json_files):
-                            relative_path_str = str(file_path)
-                            file_data = st.session_state.get('output_files', {}).get(relative_path_str, b'')
-                            if file_data:
-                                with cols[idx % len(cols)]:
-                                    display_name = "Schema (JSON)" if len(schema_json_files) == 1 else file_path.name
-                                    if len(display_name) > 25:
-                                        display_name = display_name[:22] + "..."
-                                    st.download_button(
-                                        label=display_name,
-                                        data=file_data,
-                                        file_name=file_path.name,
-                                        mime="application/json",
-                                        key=f"schema_json_{sheet_name}_{file_path.name}_{idx}",
-                                        use_container_width=True
-                                    )
-                    
-                    # Display Summary file
-                    if summary_files:
-                        num_cols = min(4, len(summary_files))
-                        cols = st.columns(num_cols, gap="small")
-                        for idx, file_path in enumerate(summary_files):
-                            relative_path_str = str(file_path)
-                            file_data = st.session_state.get('output_files', {}).get(relative_path_str, b'')
-                            if file_data:
-                                with cols[idx % len(cols)]:
-                                    display_name = "Summary" if len(summary_files) == 1 else file_path.name
-                                    if len(display_name) > 25:
-                                        display_name = display_name[:22] + "..."
-                                    st.download_button(
-                                        label=display_name,
-                                        data=file_data,
-                                        file_name=file_path.name,
-                                        mime="text/plain",
-                                        key=f"summary_{sheet_name}_{file_path.name}_{idx}",
-                                        use_container_width=True
-                                    )
-                
-                # Bulk download buttons
-                st.markdown("---")
-                st.markdown('<h3>Bulk Downloads</h3>', unsafe_allow_html=True)
-                # Center the three buttons with spacer columns
-                col_spacer1, col1, col2, col3, col_spacer2 = st.columns([1, 1.5, 1.5, 1.5, 1])
-                
-                with col1:
-                    st.download_button(
-                        label="Download CSV Files",
-                        data=csv_zip_data,
-                        file_name=f"{base_name}_csv_files.zip",
-                        mime="application/zip",
-                        help="Download all processed CSV files",
-                        use_container_width=True,
-                        key=f"bulk_csv_{base_name}"
-                    )
-                
-                with col2:
-                    st.download_button(
-                        label="Download Schema (JSON)",
-                        data=schema_json_zip_data,
-                        file_name=f"{base_name}_schemas_json.zip",
-                        mime="application/zip",
-                        help="Download all BigQuery schema JSON files",
-                        use_container_width=True,
-                        key=f"bulk_schema_json_{base_name}"
-                    )
-                
-                with col3:
-                    st.download_button(
-                        label="Download All (ZIP)",
-                        data=all_zip_data,
-                        file_name=f"{base_name}_all_files.zip",
-                        mime="application/zip",
-                        help="Download all processed files including CSV, JSON schema, and summary files",
-                        use_container_width=True,
-                        key=f"bulk_all_{base_name}"
-                    )
+            render_schema_review()
+        
+        # Only show processed results if we have files and they have been processed
+        if st.session_state.get('processed', False):
+            output_bundles = st.session_state.get('output_bundles')
+            render_processing_results(output_bundles)
+            if output_bundles is not None:
+                render_downloads(output_bundles)
     
     # Footer
     render_shared_footer()
@@ -0,0 +1,180 @@
+import io
+import os
+import tempfile
+import threading
+import time
+import zipfile
+import zlib
+from concurrent.futures import Future, ThreadPoolExecutor
+from contextlib import contextmanager
+from typing import NamedTuple
+
+# general settings
+COMPRESS_LEVEL = 6                  # zlib level used for every entry (1 fastest .. 9 smallest)
+SPOOL_MAX_BYTES = 64 * 1024 * 1024  # per-entry buffer kept in memory before spilling to disk
+CHUNK_BYTES = 1024 * 1024
+PRECOMPRESSED = (".gz", ".parquet", ".avro")
+
+class CompressedEntry(NamedTuple):
+    name: str
+    date_time: tuple
+    compress_type: int
+    crc: int
+    file_size: int
+    data: bytes
+
+
+class _InflatingReader(io.RawIOBase):
+    """Raw-deflate entry data, inflated only as far as it is read."""
+
+    def __init__(self, data: bytes):
+        self._data = memoryview(data)
+        self._pos = 0
+        self._inflate = zlib.decompressobj(-15)
+
+    def readable(self) -> bool:
+        return True
+
+    def readinto(self, b) -> int:
+        while not self._inflate.eof:
+            pending = self._inflate.unconsumed_tail
+            if not pending:
+                if self._pos >= len(self._data):
+                    break
+                pending = self._data[self._pos:self._pos + CHUNK_BYTES]
+                self._pos += len(pending)
+            out = self._inflate.decompress(pending, len(b))
+            if out:
+                b[:len(out)] = out
+                return len(out)
+        return 0
+
+
+def _compress_entry(name: str, buf, date_time: tuple, level: int) -> CompressedEntry:
+    """Raw-deflate one buffered output (runs on the worker pool)."""
+    buf.seek(0)
+    stored = name.endswith(PRECOMPRESSED)
+    comp = None if stored else zlib.compressobj(level, zlib.DEFLATED, -15)
+    crc, size, parts = 0, 0, []
+    try:
+        for chunk in iter(lambda: buf.read(CHUNK_BYTES), b""):
+            crc = zlib.crc32(chunk, crc)
+            size += len(chunk)
+            parts.append(chunk if stored else comp.compress(chunk))
+    finally:
+        buf.close()
+    if not stored:
+        parts.append(comp.flush())
+    compress_type = zipfile.ZIP_STORED if stored else zipfile.ZIP_DEFLATED
+    return CompressedEntry(name, date_time, compress_type, crc, size, b"".join(parts))
+
+
+class BundleBuilder:
+    """
+    Output sink that compresses every file exactly once and keeps the
+    compressed bytes, so any combination of files can later be served as a
+    ZIP by copying the pre-compressed entries (no recompression).
+
+    Files are buffered while they are written and handed to a thread pool
+    for compression on close, so compression of one output overlaps with
+    producing the next. Use it wherever process_sheet takes an output sink.
+    """
+
+    def __init__(self, compresslevel: int | None = None, workers: int | None = None):
+        self.compresslevel = COMPRESS_LEVEL if compresslevel is None else compresslevel
+        self.workers = workers or os.cpu_count() or 1
+        self._pool = None  # started by the first open(); adopted entries need none
+        self._entries = {}
+        self._sizes = {}
+        self._built = {}
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_entries(cls, entries) -> "BundleBuilder":
+        """Adopt CompressedEntry tuples, e.g. returned by a bundle built in another process."""
+        builder = cls()
+        for entry in entries:
+            builder._entries[entry.name] = entry
+            builder._sizes[entry.name] = entry.file_size
+        return builder
+
+    @contextmanager
+    def open(self, name: str, mode: str = "w"):
+        buf = tempfile.SpooledTemporaryFile(max_size=SPOOL_MAX_BYTES)
+        if "b" in mode:
+            yield buf
+        else:
+            text = io.TextIOWrapper(buf, encoding="utf-8", newline="")
+            yield text
+            text.flush()
+            text.detach()
+        self._sizes[name] = buf.tell()
+        with self._lock:
+            if self._pool is None:
+                self._pool = ThreadPoolExecutor(max_workers=self.workers)
+        self._entries[name] = self._pool.submit(
+            _compress_entry, name, buf, time.localtime()[:6], self.compresslevel
+        )
+
+    def add(self, name: str, data: bytes):
+        with self.open(name, "wb") as f:
+            f.write(data)
+
+    def size(self, name: str) -> int:
+        return self._sizes[name]
+
+    def namelist(self) -> list:
+        return list(self._entries)
+
+    def entry(self, name: str) -> CompressedEntry:
+        entry = self._entries[name]
+        return entry.result() if isinstance(entry, Future) else entry
+
+    def build(self, names=None) -> bytes:
+        """
+        ZIP of the given entries (all when names is None), assembled on first
+        request by copying their compressed bytes and memoized afterwards, so
+        repeated downloads of the same bundle cost nothing.
+        """
+        key = tuple(self.namelist() if names is None else names)
+        with self._lock:
+            if key in self._built:
+                return self._built[key]
+        data = self._assemble(key)
+        with self._lock:
+            return self._built.setdefault(key, data)
+
+    def _assemble(self, names) -> bytes:
+        zip_buffer = io.BytesIO()
+        with zipfile.ZipFile(zip_buffer, "w") as zip_file:
+            for name in names:
+                entry = self.entry(name)
+                info = zipfile.ZipInfo(entry.name, date_time=entry.date_time)
+                info.compress_type = entry.compress_type
+                info.external_attr = 0o644 << 16
+                info.CRC = entry.crc
+                info.file_size = entry.file_size
+                info.compress_size = len(entry.data)
+                info.header_offset = zip_file.fp.tell()
+                zip_file.fp.write(info.FileHeader())
+                zip_file.fp.write(entry.data)
+                zip_file.filelist.append(info)
+                zip_file.NameToInfo[info.filename] = info
+                zip_file.start_dir = zip_file.fp.tell()
+        return zip_buffer.getvalue()
+
+    def open_entry(self, name: str):
+        """Readable, lazily decompressed stream of one entry, straight from its compressed bytes."""
+        entry = self.entry(name)
+        if entry.compress_type == zipfile.ZIP_STORED:
+            return io.BytesIO(entry.data)
+        return io.BufferedReader(_InflatingReader(entry.data), CHUNK_BYTES)
+
+    def read(self, name: str) -> bytes:
+        with self.open_entry(name) as f:
+            return f.read()
+
+    def close(self):
+        """Wait for pending compression; entries stay available."""
+        if self._pool is not None:
+            self._pool.shutdown(wait=True)
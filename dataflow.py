@@ -0,0 +1,155 @@
+from pathlib import Path
+from typing import NamedTuple
+
+# Programmatic API for pipelines (Airflow tasks, scripts): validate or
+# process a file with an explicit Config instead of main's module settings.
+# Importing it loads neither Streamlit nor pandas; the pipeline modules are
+# imported on first use, so short-lived workers start fast.
+
+# Config field -> main setting it overrides
+_SETTING_NAMES = {
+    "dayfirst": "DAYFIRST_HINT",
+    "thresh_date": "THRESH_DATE",
+    "thresh_numeric": "THRESH_NUMERIC",
+    "max_rows_sample": "MAX_ROWS_SAMPLE",
+    "decimal_char": "DECIMAL_CHAR",
+    "output_format": "OUTPUT_FORMAT",
+    "shard_rows": "CSV_SHARD_ROWS",
+    "shard_bytes": "CSV_SHARD_BYTES",
+    "gzip_csv": "CSV_GZIP",
+}
+
+
+class Config(NamedTuple):
+    """Run options; None keeps main's default for that setting."""
+    dayfirst: bool | None = None
+    thresh_date: float | None = None
+    thresh_numeric: float | None = None
+    max_rows_sample: int | None = None
+    decimal_char: str | None = None
+    output_format: str | None = None
+    shard_rows: int | None = None
+    shard_bytes: int | None = None
+    gzip_csv: bool | None = None
+    profiles: dict | str | None = None   # saved schema profiles, or the path of a profiles JSON
+    override_types: dict | None = None   # {sheet: {column: type}}; takes precedence over profiles
+    expect_schema: str | None = None     # _bq_schema.json (or directory of them) for a drift check
+    nrows: int | None = None             # validate only the first nrows rows of every sheet
+
+    def settings(self) -> dict:
+        """main settings overridden by this config."""
+        return {
+            setting: getattr(self, field)
+            for field, setting in _SETTING_NAMES.items() if getattr(self, field) is not None
+        }
+
+
+class SheetResult(NamedTuple):
+    name: str
+    frame: object        # typed pandas DataFrame
+    schema: list         # BigQuery JSON schema fields
+    types: dict          # {column: type}
+    date_formats: dict   # {column: output format} for DATE/TIMESTAMP columns
+    diagnostics: dict    # rows, nulls and invalid values per column, profile, drift
+
+
+class Result(NamedTuple):
+    path: str
+    sheets: list         # SheetResult per sheet
+
+    @property
+    def problems(self) -> list:
+        """Human-readable reasons the file would not load cleanly."""
+        problems = []
+        for sheet in self.sheets:
+            for col, count in sheet.diagnostics["invalid"].items():
+                problems.append(f"{sheet.name}: {col}: {count} value(s) not valid {sheet.types[col]}")
+            drift = sheet.diagnostics["drift"]
+            if drift is not None and not drift.ok:
+                problems.append(drift.describe())
+        return problems
+
+    @property
+    def ok(self) -> bool:
+        return not self.problems
+
+
+def _profiles(config: Config):
+    if isinstance(config.profiles, (str, Path)):
+        from profiles import load_profiles
+        return load_profiles(config.profiles)
+    return config.profiles
+
+
+def _present_counts(df_raw, main) -> list:
+    """Non-missing cells per raw column, by the same NA spellings strip_cell maps to null."""
+    na_values = [key for key in main.NA_MAP if isinstance(key, str)]
+    return [
+        int((~df_raw[col].astype(str).str.replace(main.NBSP, " ").str.strip().isin(na_values)).sum())
+        for col in df_raw.columns
+    ]
+
+
+def validate(path, config: Config | None = None) -> Result:
+    """
+    Read and type every sheet of path as processing would, without writing
+    anything. Diagnostics per sheet: row count, nulls per column, values
+    that did not survive typing to the chosen type ("invalid"), the
+    matching profile and, with config.expect_schema, the drift report.
+    """
+    import main
+    from drift import DriftReport, compare, find_schema, load_bq_schema
+    from profiles import find_profile, header_signature
+
+    config = config or Config()
+    profiles = _profiles(config)
+    sheets = []
+    with main.override_settings(config.settings()):
+        for name, df_raw in main.read_input(path, config.nrows).items():
+            match = find_profile(profiles, header_signature(df_raw)) if profiles else None
+            override_types = (config.override_types or {}).get(name)
+            if override_types is None and match is not None:
+                override_types = dict(match[1]["types"])
+            present = _present_counts(df_raw, main)
+            frame, types, date_formats = main.type_sheet(df_raw, override_types)
+            typed_present = frame.notna().sum()
+            drift = None
+            if config.expect_schema:
+                schema_path = find_schema(config.expect_schema, name)
+                if schema_path is None:
+                    drift = DriftReport(name, None, [], [], [])
+                else:
+                    observed = {col: types[col] for col in frame.columns}
+                    drift = compare(name, load_bq_schema(schema_path), observed, str(schema_path))
+            diagnostics = {
+                "rows": len(frame),
+                "nulls": {col: int(len(frame) - before) for col, before in zip(frame.columns, present)},
+                "invalid": {
+                    col: int(before - typed_present[col])
+                    for col, before in zip(frame.columns, present) if before > typed_present[col]
+                },
+                "profile": match[0] if match else None,
+                "drift": drift,
+            }
+            sheets.append(SheetResult(name, frame, main.bq_schema_from_df(frame, date_formats),
+                                      types, date_formats, diagnostics))
+    return Result(str(path), sheets)
+
+
+def process(path, out_dir, config: Config | None = None) -> list:
+    """
+    Process path into out_dir (directory or output sink) like the CLI; one
+    result dict per sheet (see main.process_sheet).
+    """
+    import main
+
+    config = config or Config()
+    profiles = _profiles(config)
+    results = []
+    with main.override_settings(config.settings()):
+        for name, df_raw in main.read_input(path).items():
+            override_types = (config.override_types or {}).get(name)
+            if override_types is None:
+                override_types = main.profile_types(profiles, df_raw)
+            results.append(main.process_sheet(name, df_raw, out_dir, override_types=override_types))
+    return results
@@ -0,0 +1,114 @@
+import json
+from pathlib import Path
+from typing import NamedTuple
+
+import pandas as pd
+
+from main import _map_bq_type_for_schema, infer_column, output_base, read_input, simple_header, strip_cell
+
+# general settings
+DRIFT_SAMPLE_ROWS = 2000  # rows read per sheet for the check; the rest of the file is never parsed
+
+# Stored type -> observed types it still accepts (a sample of whole numbers loads fine as FLOAT, ...)
+COMPATIBLE_TYPES = {
+    "FLOAT": {"FLOAT", "INTEGER"},
+    "TIMESTAMP": {"TIMESTAMP", "DATE"},
+}
+
+
+class DriftReport(NamedTuple):
+    sheet: str
+    schema: str | None   # schema file compared against (None: no stored schema found)
+    added: list          # columns in the file but not in the schema
+    removed: list        # columns in the schema but not in the file
+    retyped: list        # (column, stored type, observed type)
+
+    @property
+    def ok(self) -> bool:
+        """Matches its stored schema; a sheet without one can't be vouched for."""
+        return self.schema is not None and not (self.added or self.removed or self.retyped)
+
+    def describe(self) -> str:
+        if self.schema is None:
+            return f"{self.sheet}: no stored schema"
+        if self.ok:
+            return f"{self.sheet}: matches {self.schema}"
+        parts = []
+        if self.added:
+            parts.append(f"added {', '.join(self.added)}")
+        if self.removed:
+            parts.append(f"removed {', '.join(self.removed)}")
+        if self.retyped:
+            parts.append("retyped " + ", ".join(f"{col} ({old} -> {new})" for col, old, new in self.retyped))
+        return f"{self.sheet}: drift from {self.schema}: " + "; ".join(parts)
+
+
+def load_bq_schema(path) -> dict:
+    """{column: type} from a *_bq_schema.json written by process_sheet."""
+    with open(path, encoding="utf-8") as f:
+        return {field["name"]: field["type"].upper() for field in json.load(f)}
+
+
+def read_sample(path, nrows: int | None = None) -> dict:
+    """First rows of every sheet of a .xlsx/.xls/.csv file, as raw strings."""
+    return read_input(path, DRIFT_SAMPLE_ROWS if nrows is None else nrows)
+
+
+def observed_types(df_raw: pd.DataFrame) -> dict:
+    """
+    Schema type inferred from a sample per (cleaned) column; None for a
+    column that is empty in the sample, which can't drift.
+    """
+    types = {}
+    for raw_col, col in zip(df_raw.columns, [simple_header(c) for c in df_raw.columns]):
+        sample = df_raw[raw_col].map(strip_cell)
+        if sample.isna().all():
+            types[col] = None
+            continue
+        _, bq_type, _ = infer_column(sample, col)
+        types[col] = _map_bq_type_for_schema(bq_type)
+    return types
+
+
+def compare(sheet: str, expected: dict, observed: dict, schema: str) -> DriftReport:
+    """Columns added, removed and retyped between a stored schema and observed types."""
+    added = [col for col in observed if col not in expected]
+    removed = [col for col in expected if col not in observed]
+    retyped = []
+    for col, new in observed.items():
+        old = expected.get(col)
+        if old is None or new is None or old == "STRING":
+            continue
+        old, new = _map_bq_type_for_schema(old), _map_bq_type_for_schema(new)
+        if new not in COMPATIBLE_TYPES.get(old, {old}):
+            retyped.append((col, old, new))
+    return DriftReport(sheet, schema, added, removed, retyped)
+
+
+def find_schema(expect, sheet: str, rel=None) -> Path | None:
+    """
+    expect is one schema file for every sheet, or a directory of
+    <sheet>_bq_schema.json files such as a previous output dir. A batch run
+    writes each input's schemas into its own sub-directory, so rel (the
+    input's relative output dir) is looked in first.
+    """
+    expect = Path(expect)
+    if not expect.is_dir():
+        return expect
+    name = f"{output_base(sheet)}_bq_schema.json"
+    for candidate in ([expect / rel / name] if rel is not None else []) + [expect / name]:
+        if candidate.is_file():
+            return candidate
+    return None
+
+
+def check_file(path, expect, nrows: int | None = None, rel=None) -> list:
+    """DriftReport per sheet of path against the stored schema(s) in expect (see find_schema)."""
+    reports = []
+    for sheet, df in read_sample(path, nrows).items():
+        schema_path = find_schema(expect, sheet, rel)
+        if schema_path is None:
+            reports.append(DriftReport(sheet, None, [], [], []))
+            continue
+        reports.append(compare(sheet, load_bq_schema(schema_path), observed_types(df), str(schema_path)))
+    return reports
@@ -0,0 +1,378 @@
+import multiprocessing
+import os
+import queue
+import threading
+import time
+import uuid
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+# general settings
+JOB_WORKERS = max(1, min(4, (os.cpu_count() or 1) - 1))  # worker processes shared by all sessions
+JOB_MEMORY_BUDGET = None   # bytes all running jobs may reserve; None = half of physical memory
+JOB_MEMORY_HEADROOM = 512 * 1024 * 1024  # free memory always left to the server itself
+JOB_MAX_PER_OWNER = 2      # jobs one session may have running at once
+JOB_AGING_RATE = 1.0       # seconds of estimated cost forgiven per second spent waiting
+JOB_POLL_SECONDS = 1       # how often the app refreshes the progress of a running job
+
+JOB_STATES = ("queued", "running", "done", "failed", "cancelled")
+
+
+class JobCancelled(Exception):
+    """Raised from WorkerJob.report() once cancellation has been requested."""
+
+
+def _physical_memory() -> int | None:
+    try:
+        return os.sysconf("SC_PAGE_SIZE") * os.sysconf("SC_PHYS_PAGES")
+    except (AttributeError, ValueError, OSError):
+        return None
+
+
+def _available_memory() -> int | None:
+    """MemAvailable from /proc/meminfo (Linux); None where it can't be read."""
+    try:
+        with open("/proc/meminfo") as f:
+            for line in f:
+                if line.startswith("MemAvailable:"):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    return None
+
+
+class Job:
+    """
+    Server-side view of one queued or running unit of work: progress,
+    per-stage timings, result and cancellation. The work itself runs in a
+    worker process and reports back through the JobQueue that owns the job.
+    A cancelled job's result is whatever partial result the task left.
+    """
+
+    def __init__(self, label: str, owner: str | None = None, memory: int = 0, cost: float = 0.0):
+        self.id = uuid.uuid4().hex
+        self.label = label
+        self.owner = owner
+        self.memory = memory
+        self.cost = cost
+        self.state = "queued"
+        self.position = None
+        self.stage = None
+        self.sheet = None
+        self.done = 0
+        self.total = 0
+        self.sheets_done = 0
+        self.sheets_total = 0
+        self.timings = []
+        self.result = None
+        self.error = None
+        self.exception = None
+        self.created = time.time()
+        self.started = None
+        self.finished = None
+        self._stage_started = None
+        self._cancel = None
+        self._cancel_requested = False
+        self._queue = None
+        self._lock = threading.Lock()
+
+    def report(self, stage: str, done: int = 0, total: int = 0, sheet: str | None = None, at: float | None = None):
+        """Record progress within the current sheet (applied from the worker's updates)."""
+        with self._lock:
+            now = time.time() if at is None else at
+            if (sheet, stage) != (self.sheet, self.stage):
+                self._close_stage(now)
+                self.sheet, self.stage, self._stage_started = sheet, stage, now
+            self.done, self.total = done, total
+
+    def report_sheets(self, done: int, total: int):
+        with self._lock:
+            self.sheets_done, self.sheets_total = done, total
+
+    def cancel(self):
+        """Stop at the worker's next checkpoint, or drop the job if it is still queued."""
+        self._cancel_requested = True
+        if self._queue is not None:
+            self._queue._cancel(self)
+
+    @property
+    def cancel_requested(self) -> bool:
+        return self._cancel_requested
+
+    @property
+    def finished_running(self) -> bool:
+        return self.state in ("done", "failed", "cancelled")
+
+    def snapshot(self) -> dict:
+        """Consistent copy of the progress fields for display."""
+        with self._lock:
+            timings = list(self.timings)
+            if self.stage is not None and self._stage_started is not None and not self.finished_running:
+                timings.append((self._stage_label(), time.time() - self._stage_started))
+            return {
+                "id": self.id, "label": self.label, "state": self.state, "position": self.position,
+                "cost": self.cost,
+                "stage": self.stage, "sheet": self.sheet, "done": self.done, "total": self.total,
+                "sheets_done": self.sheets_done, "sheets_total": self.sheets_total,
+                "timings": timings, "error": self.error,
+                "elapsed": (self.finished or time.time()) - (self.started or self.created),
+            }
+
+    def _stage_label(self) -> str:
+        return f"{self.sheet}: {self.stage}" if self.sheet else self.stage
+
+    def _close_stage(self, now: float):
+        if self.stage is not None:
+            self.timings.append((self._stage_label(), now - self._stage_started))
+        self.stage = None
+
+    def _finish(self, state: str, result=None, exception: BaseException | None = None):
+        with self._lock:
+            self._close_stage(time.time())
+        self.result = result
+        if exception is not None:
+            self.error = f"{type(exception).__name__}: {exception}"
+            self.exception = exception
+        self.finished = time.time()
+        self.position = None
+        # Set last: readers treat a finished state as "result and timings are final"
+        self.state = state
+
+
+class WorkerJob:
+    """
+    The job as seen by the task function inside a worker process. report()
+    forwards progress to the server and is the cancellation checkpoint;
+    whatever the task leaves in .partial is returned if it is cancelled.
+    """
+
+    def __init__(self, job_id: str, updates, cancel):
+        self.id = job_id
+        self.partial = None
+        self._updates = updates
+        self._cancel = cancel
+
+    def report(self, stage: str, done: int = 0, total: int = 0, sheet: str | None = None):
+        if self._cancel.is_set():
+            raise JobCancelled(self.id)
+        self._updates.put((self.id, "report", (stage, done, total, sheet, time.time())))
+
+    def report_sheets(self, done: int, total: int):
+        self._updates.put((self.id, "sheets", (done, total)))
+
+    def sheet_progress(self, sheet: str):
+        """Callback for process_sheet's progress= argument."""
+        return lambda stage, done, total: self.report(stage, done, total, sheet=sheet)
+
+
+def _run_task(fn, job_id, updates, cancel, args, kwargs):
+    """Worker-process entry point; exceptions propagate to the server as usual."""
+    job = WorkerJob(job_id, updates, cancel)
+    if cancel.is_set():
+        return "cancelled", None
+    try:
+        return "done", fn(job, *args, **kwargs)
+    except JobCancelled:
+        return "cancelled", job.partial
+
+
+class JobQueue:
+    """
+    Server-wide job queue in front of a pool of worker processes, so heavy
+    pandas work from different sessions runs in parallel and outside the
+    Streamlit script threads. Every job works on its own copy of its inputs
+    in a worker, so sessions never share state. A queued job only starts
+    when its memory estimate fits in what the running jobs leave of the
+    budget (and of the memory actually free); with nothing running the next
+    job always starts, so one larger than the budget still completes, alone.
+
+    Among the queued jobs that may start, the one with the smallest
+    estimated cost minus JOB_AGING_RATE * seconds waited goes first
+    (shortest job first with aging, so small validations overtake big
+    workbooks but big ones are never starved), and no session runs more
+    than JOB_MAX_PER_OWNER jobs at once while other sessions' jobs wait
+    (a lone batch may use every idle worker).
+    Task functions must be importable without Streamlit; arguments and
+    results must be picklable.
+    """
+
+    def __init__(self, workers: int | None = None, memory_budget: int | None = None,
+                 max_per_owner: int | None = None, aging_rate: float | None = None):
+        self.workers = workers or JOB_WORKERS
+        self.max_per_owner = max_per_owner or JOB_MAX_PER_OWNER
+        self.aging_rate = JOB_AGING_RATE if aging_rate is None else aging_rate
+        if memory_budget is None:
+            memory_budget = JOB_MEMORY_BUDGET
+        if memory_budget is None:
+            physical = _physical_memory()
+            memory_budget = physical // 2 if physical else 4 * 1024 * 1024 * 1024
+        self.memory_budget = memory_budget
+        self._ctx = multiprocessing.get_context("spawn")
+        self._pool = self._new_pool()
+        self._manager = self._ctx.Manager()
+        self._updates = self._manager.Queue()
+        self._jobs = {}
+        self._pending = deque()
+        self._running = {}
+        self._reserved = 0
+        self._lock = threading.RLock()
+        self._listener = threading.Thread(target=self._listen, name="job-updates", daemon=True)
+        self._listener.start()
+
+    def submit(self, label: str, fn, *args, owner: str | None = None, memory: int = 0,
+               cost: float = 0.0, **kwargs) -> Job:
+        """
+        Queue fn(job, *args, **kwargs) and return its Job. memory (bytes) and
+        cost (roughly seconds of work) are the caller's estimates.
+        """
+        job = Job(label, owner=owner, memory=memory, cost=cost)
+        job._queue = self
+        job._cancel = self._manager.Event()
+        with self._lock:
+            self._jobs[job.id] = job
+            self._pending.append((job, fn, args, kwargs))
+            self._dispatch()
+        return job
+
+    def jobs(self, owner: str | None = None) -> list:
+        """Queued and running jobs, optionally only one session's."""
+        with self._lock:
+            return [job for job in self._jobs.values() if owner is None or job.owner == owner]
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "workers": self.workers, "running": len(self._running), "queued": len(self._pending),
+                "reserved_bytes": self._reserved, "memory_budget": self.memory_budget,
+            }
+
+    def shutdown(self):
+        for job in self.jobs():
+            job.cancel()
+        self._pool.shutdown(wait=True, cancel_futures=True)
+        self._updates.put(None)
+        self._listener.join()
+        self._manager.shutdown()
+
+    def _admissible(self, job: Job) -> bool:
+        if not self._running:
+            return True
+        if len(self._running) >= self.workers:
+            return False
+        if self._reserved + job.memory > self.memory_budget:
+            return False
+        available = _available_memory()
+        return available is None or job.memory <= available - JOB_MEMORY_HEADROOM
+
+    def _priority(self, job: Job, now: float) -> float:
+        return job.cost - self.aging_rate * (now - job.created)
+
+    def _next_pending(self) -> int | None:
+        """Index in the pending queue of the job to start next, or None when none fits."""
+        now = time.time()
+        per_owner = {}
+        for owner in self._running.values():
+            per_owner[owner] = per_owner.get(owner, 0) + 1
+        candidates = [
+            i for i, (job, *_) in enumerate(self._pending)
+            if job.owner is None or per_owner.get(job.owner, 0) < self.max_per_owner
+        ]
+        if not candidates:
+            # Only sessions already at their limit are waiting: use the idle workers anyway
+            candidates = list(range(len(self._pending)))
+        candidates.sort(key=lambda i: self._priority(self._pending[i][0], now))
+        for i in candidates:
+            if self._admissible(self._pending[i][0]):
+                return i
+            if self._running:
+                # Don't let smaller jobs keep slipping past the best one while it waits for room
+                return None
+        return None
+
+    def _dispatch(self):
+        with self._lock:
+            while (index := self._next_pending()) is not None:
+                job, fn, args, kwargs = self._pending[index]
+                del self._pending[index]
+                self._start(job, fn, args, kwargs)
+            now = time.time()
+            order = sorted(self._pending, key=lambda pending: self._priority(pending[0], now))
+            for position, (job, *_) in enumerate(order, start=1):
+                job.position = position
+
+    def _new_pool(self) -> ProcessPoolExecutor:
+        return ProcessPoolExecutor(max_workers=self.workers, mp_context=self._ctx)
+
+    def _replace_pool(self, broken: ProcessPoolExecutor):
+        """Swap in a fresh executor after a worker died; jobs on the old one have failed."""
+        with self._lock:
+            if self._pool is not broken:
+                return  # already replaced for another job of the same pool
+            self._pool = self._new_pool()
+        broken.shutdown(wait=False, cancel_futures=True)
+
+    def _start(self, job: Job, fn, args, kwargs):
+        self._running[job.id] = job.owner
+        self._reserved += job.memory
+        job.position = None
+        job.started = time.time()
+        job.state = "running"
+        pool = self._pool
+        try:
+            future = pool.submit(_run_task, fn, job.id, self._updates, job._cancel, args, kwargs)
+        except BrokenProcessPool as e:
+            # A worker died and took the executor down: fail this job, carry on with a new pool
+            self._running.pop(job.id, None)
+            self._reserved -= job.memory
+            self._jobs.pop(job.id, None)
+            job._finish("failed", exception=e)
+            self._replace_pool(pool)
+            return
+        future.add_done_callback(lambda f, job=job, pool=pool: self._done(job, f, pool))
+
+    def _done(self, job: Job, future, pool: ProcessPoolExecutor | None = None):
+        with self._lock:
+            self._running.pop(job.id, None)
+            self._reserved -= job.memory
+            self._jobs.pop(job.id, None)
+        if future.cancelled():
+            job._finish("cancelled")
+        elif future.exception() is not None:
+            if isinstance(future.exception(), BrokenProcessPool) and pool is not None:
+                self._replace_pool(pool)
+            job._finish("failed", exception=future.exception())
+        else:
+            state, result = future.result()
+            job._finish(state, result)
+        self._dispatch()
+
+    def _cancel(self, job: Job):
+        with self._lock:
+            for i, (pending, *_) in enumerate(self._pending):
+                if pending is job:
+                    del self._pending[i]
+                    self._jobs.pop(job.id, None)
+                    job._finish("cancelled")
+                    break
+            else:
+                job._cancel.set()
+            self._dispatch()
+
+    def _listen(self):
+        while True:
+            try:
+                update = self._updates.get()
+            except (EOFError, OSError, queue.Empty):
+                return
+            if update is None:
+                return
+            job_id, kind, payload = update
+            job = self._jobs.get(job_id)
+            if job is None:
+                continue
+            if kind == "report":
+                stage, done, total, sheet, at = payload
+                job.report(stage, done, total, sheet=sheet, at=at)
+            elif kind == "sheets":
+                job.report_sheets(*payload)
@@ -1,13 +1,25 @@
 import csv
+import gzip
+import io
+import argparse
+import glob
 import json
+import os
 import re
+import sys
+import threading
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from contextlib import contextmanager
 from datetime import datetime, timedelta
 from pathlib import Path
 
 import numpy as np
 import pandas as pd
 
-# ========= CONFIG (edit these two) =========
+from profiles import find_profile, header_signature, load_profiles, profiles_fingerprint
+
+# ========= CONFIG (defaults when run without arguments) =========
 INPUT_FILE = "dataset.xlsx"
 OUTPUT_DIR = "clean_output"
 # ==========================================
@@ -18,13 +30,35 @@ THRESH_NUMERIC = 0.88         # (kept, but numeric inference now requires 100% n
 THRESH_DATE = 0.65            # share of parsable rows to accept date
 MAX_ROWS_SAMPLE = 20000       # speed cap per column for inference
 DECIMAL_CHAR = "."            # set "," if decimals use comma
+BQ_AUTODETECT_WINDOW = 500    # rows BigQuery Autodetect samples from the top of a CSV
+AUTODETECT_WINDOW_ONLY = False  # True: only promote enough rows to cover that window
+OUTPUT_FORMAT = "csv"         # "csv", "parquet", "avro" or "ndjson"
+PARQUET_COMPRESSION = "snappy"
+PARQUET_ROW_GROUP_ROWS = 100_000
+AVRO_CODEC = "deflate"        # "deflate", "snappy" or "null"
+AVRO_SYNC_INTERVAL = 1 << 20  # approx. bytes per Avro block
+AVRO_BATCH_ROWS = 50_000      # rows converted to Python values at a time
+NDJSON_BATCH_ROWS = 50_000    # rows serialized per write for NDJSON output
+CSV_SHARD_ROWS = None         # split CSV output every N rows (None: one file)
+CSV_SHARD_BYTES = None        # or aim for shards of about this many uncompressed bytes
+CSV_GZIP = False              # write .csv.gz shards
+GZIP_LEVEL = 6
+COMPRESS_WORKERS = os.cpu_count() or 1
+CSV_SIZE_SAMPLE_ROWS = 1000   # rows rendered to estimate bytes per row for CSV_SHARD_BYTES
 CURRENCY_CHARS = "£$€¥₹"
 NBSP = "\u00A0"
 EXCEL_EPOCH = datetime(1899, 12, 30)
 EXCEL_DATE_MIN = 20000
 EXCEL_DATE_MAX = 60000
+NS_PER_DAY = 86_400_000_000_000
 BOOL_TRUE = {"true", "t", "yes", "y", "1"}
 BOOL_FALSE = {"false", "f", "no", "n", "0"}
+OUTPUT_FORMATS = ("csv", "parquet", "avro", "ndjson")
+INPUT_SUFFIXES = (".xlsx", ".xlsm", ".xls", ".csv")
+CLI_SETTINGS = (                 # module settings the command line may override
+    "DAYFIRST_HINT", "THRESH_NUMERIC", "THRESH_DATE", "MAX_ROWS_SAMPLE", "DECIMAL_CHAR",
+    "OUTPUT_FORMAT", "CSV_SHARD_ROWS", "CSV_SHARD_BYTES", "CSV_GZIP",
+)
 
 NA_MAP = {
     "": np.nan,
@@ -200,10 +234,9 @@ def infer_column(s: pd.Series, name: str):
         else:
             full_dt, _ = try_parse_date_direction(s, dayfirst=not DAYFIRST_HINT)
 
-        nonnull = full_dt.dropna()
         bq_type = "TIMESTAMP"
         date_fmt = "%Y-%m-%d %H:%M:%S"
-        if not nonnull.empty and (nonnull.dt.time == datetime.min.time()).all():
+        if full_dt.notna().any() and is_all_midnight(full_dt):
             bq_type = "DATE"
             date_fmt = "%Y-%m-%d"
         return full_dt, bq_type, date_fmt
@@ -284,8 +317,12 @@ def _map_bq_type_for_schema(t: str) -> str:
     # STRING, DATE, TIMESTAMP already match what BigQuery expects
     return t_upper
 
-def bq_schema_from_df(df: pd.DataFrame, date_fmt_map: dict) -> list:
-    schema = []
+def bq_types_from_df(df: pd.DataFrame, date_fmt_map: dict) -> dict:
+    """
+    BigQuery schema type per column of the typed frame. This is the single
+    type map behind the JSON schema and the typed (non-CSV) output writers.
+    """
+    types = {}
     for col in df.columns:
         if col in date_fmt_map and date_fmt_map[col] == "%Y-%m-%d":
             bq = "DATE"
@@ -301,72 +338,469 @@ def bq_schema_from_df(df: pd.DataFrame, date_fmt_map: dict) -> list:
                 bq = "BOOL"
             else:
                 bq = "STRING"
+        types[col] = _map_bq_type_for_schema(bq)
+    return types
+
+def bq_schema_from_df(df: pd.DataFrame, date_fmt_map: dict) -> list:
+    schema = []
+    for col, bq in bq_types_from_df(df, date_fmt_map).items():
         schema.append({
             "description": "",
             "name": col,
-            "type": _map_bq_type_for_schema(bq),
+            "type": bq,
             "mode": "NULLABLE"
         })
     return schema
 
+def _naive_datetime64(s: pd.Series):
+    """
+    Return the column as a naive datetime64[ns] array, or None when it can't
+    be handled at array level (tz-aware or non-datetime data).
+    """
+    if not pd.api.types.is_datetime64_dtype(s.dtype):
+        return None
+    return s.to_numpy(dtype="datetime64[ns]")
+
+def is_all_midnight(s: pd.Series) -> bool:
+    """
+    True if every non-null timestamp falls exactly on midnight.
+    Uses integer arithmetic on the datetime64 values instead of building a
+    Python time object per row.
+    """
+    values = _naive_datetime64(s)
+    if values is None:
+        nonnull = s.dropna()
+        return bool((nonnull.dt.time == datetime.min.time()).all())
+    ticks = values.view("i8")[~np.isnat(values)]
+    return bool(np.all(ticks % NS_PER_DAY == 0))
+
+def format_datetime_iso(s: pd.Series, fmt: str) -> pd.Series:
+    """
+    Vectorized equivalent of s.dt.strftime(fmt) for the two output formats
+    (DATE and TIMESTAMP). Missing values stay NaN.
+    """
+    values = _naive_datetime64(s)
+    if values is None or fmt not in {"%Y-%m-%d", "%Y-%m-%d %H:%M:%S"}:
+        return s.dt.strftime(fmt)
+    unit = "D" if fmt == "%Y-%m-%d" else "s"
+    text = np.datetime_as_string(values.astype(f"datetime64[{unit}]"), unit=unit)
+    if unit == "s" and len(text):
+        # ISO output is YYYY-MM-DDTHH:MM:SS; swap the "T" in place through a
+        # code-point view rather than a per-element string replace
+        text.view(np.uint32).reshape(len(text), -1)[:, 10] = ord(" ")
+    out = text.astype(object)
+    out[np.isnat(values)] = np.nan
+    return pd.Series(out, index=s.index, name=s.name)
+
 def format_dates_for_csv(df: pd.DataFrame, date_fmt_map: dict) -> pd.DataFrame:
     out = df.copy()
     for col, fmt in date_fmt_map.items():
-        if fmt == "%Y-%m-%d":
-            out[col] = out[col].dt.strftime("%Y-%m-%d")
-        elif fmt == "%Y-%m-%d %H:%M:%S":
-            out[col] = out[col].dt.strftime("%Y-%m-%d %H:%M:%S")
+        if fmt in {"%Y-%m-%d", "%Y-%m-%d %H:%M:%S"}:
+            out[col] = format_datetime_iso(out[col], fmt)
     return out
 
-def reorder_for_bq_autodetect(df: pd.DataFrame, bq_type_map: dict) -> pd.DataFrame:
+def _letter_mask(df: pd.DataFrame, cols: list) -> np.ndarray:
+    mask = np.zeros(len(df), dtype=bool)
+    for c in cols:
+        s = df[c]
+        if s.dtype != object:
+            s = s.astype(str)
+        mask |= s.str.contains(r"[A-Za-z]", na=False).to_numpy(dtype=bool)
+    return mask
+
+def reorder_for_bq_autodetect(df: pd.DataFrame, bq_type_map: dict, window_only: bool | None = None) -> pd.DataFrame:
     """
     Move rows with letters in STRING columns to the top so BigQuery Autodetect
     reliably infers STRING for those columns. Deterministic, no data changes.
+
+    This is a stable two-way partition (letter rows first, then the rest, each
+    in original order). With window_only=True only the first letter-bearing
+    row of each STRING column is promoted, and only when that column has no
+    letters inside the first BQ_AUTODETECT_WINDOW rows already.
     """
+    if window_only is None:
+        window_only = AUTODETECT_WINDOW_ONLY
     string_cols = [c for c, t in bq_type_map.items() if t == "STRING" and c in df.columns]
     if not string_cols:
         return df
-    has_letters = pd.Series(False, index=df.index)
+
+    if not window_only:
+        has_letters = _letter_mask(df, string_cols)
+        if has_letters.all() or not has_letters.any():
+            return df
+        order = np.concatenate([np.flatnonzero(has_letters), np.flatnonzero(~has_letters)])
+        return df.take(order)
+
+    # Promoting k rows pushes the rest down by k, so a column is only safe if
+    # its first letter row sits above window - (number of STRING columns).
+    safe_limit = max(BQ_AUTODETECT_WINDOW - len(string_cols), 0)
+    promote = set()
     for c in string_cols:
-        s = df[c].astype(str)
-        has_letters = has_letters | s.str.contains(r"[A-Za-z]", na=False)
-    out = df.copy()
-    out["__letters__"] = has_letters.astype(int)
-    out = out.sort_values("__letters__", ascending=False).drop(columns="__letters__")
-    return out
+        hits = np.flatnonzero(_letter_mask(df, [c]))
+        if len(hits) and hits[0] >= safe_limit:
+            promote.add(int(hits[0]))
+    if not promote:
+        return df
+    head = np.array(sorted(promote), dtype=np.int64)
+    rest = np.setdiff1d(np.arange(len(df)), head, assume_unique=True)
+    return df.take(np.concatenate([head, rest]))
+
+@contextmanager
+def _open_output(target, mode: str = "w"):
+    """Open a path for writing, or pass an already open file object through."""
+    if hasattr(target, "write"):
+        yield target
+    elif "b" in mode:
+        with open(target, mode) as f:
+            yield f
+    else:
+        with open(target, mode, encoding="utf-8", newline="") as f:
+            yield f
+
+class DirectorySink:
+    """Output sink that writes each output file into a directory."""
+
+    def __init__(self, root: Path):
+        self.root = Path(root)
+        self.root.mkdir(parents=True, exist_ok=True)
+
+    @contextmanager
+    def open(self, name: str, mode: str = "w"):
+        with _open_output(self.root / name, mode) as f:
+            yield f
+
+    def size(self, name: str) -> int:
+        return (self.root / name).stat().st_size
+
+def remove_stale_outputs(out_dir, previous: list, current: list):
+    """
+    Delete the files (relative to out_dir) an earlier run of an input wrote
+    that this run did not write again, e.g. shards of another shard count
+    or the CSV of a run with another format, so no leftovers match a load.
+    """
+    for name in set(previous) - set(current):
+        (Path(out_dir) / name).unlink(missing_ok=True)
+
+class QuoteCheckingWriter:
+    """
+    Text sink that forwards to the underlying file handle and checks quote
+    balance per CSV record as it is emitted, so no second pass over the
+    written file is needed. The csv module hands over exactly one record per
+    write() call, so a field with embedded newlines is still one record.
+    Records are numbered from 1 (the header).
+    """
 
-def write_clean_csv(df: pd.DataFrame, path: Path):
+    def __init__(self, fh):
+        self._write = fh.write
+        self.records = 0
+        self.bad_records = []
+
+    def write(self, text: str):
+        self.records += 1
+        if text.count('"') % 2:
+            self.bad_records.append(self.records)
+        return self._write(text)
+
+def _to_clean_csv(df: pd.DataFrame, writer: QuoteCheckingWriter):
     # Write as-is and tell pandas how to render missing values
     df.to_csv(
-        path,
+        writer,
         index=False,
         quoting=csv.QUOTE_ALL,
         quotechar='"',
         doublequote=True,
         lineterminator="\n",
-        encoding="utf-8",
         na_rep=""
     )
 
+def write_clean_csv(df: pd.DataFrame, path: Path) -> list:
+    """
+    Write the frame as a quote-everything CSV to a path or open text file.
+    Returns the numbers of records with unbalanced quotes (empty when clean).
+    """
+    with _open_output(path, "w") as f:
+        writer = QuoteCheckingWriter(f)
+        _to_clean_csv(df, writer)
+    return writer.bad_records
+
+def render_clean_csv(df: pd.DataFrame):
+    """Same as write_clean_csv but returns (csv_text, bad_records) in memory."""
+    buf = io.StringIO()
+    writer = QuoteCheckingWriter(buf)
+    _to_clean_csv(df, writer)
+    return buf.getvalue(), writer.bad_records
+
+def csv_shard_rows(df: pd.DataFrame, shard_rows: int | None, shard_bytes: int | None) -> int:
+    """
+    Rows per CSV shard. A byte target is turned into a row count from the
+    rendered size of the first CSV_SIZE_SAMPLE_ROWS rows.
+    """
+    if shard_rows:
+        return max(int(shard_rows), 1)
+    if shard_bytes and len(df):
+        sample = df.head(CSV_SIZE_SAMPLE_ROWS)
+        text, _ = render_clean_csv(sample)
+        row_bytes = max(len(text.encode("utf-8")) / len(sample), 1.0)
+        return max(int(shard_bytes // row_bytes), 1)
+    return max(len(df), 1)
+
+def write_csv_shards(df: pd.DataFrame, bq_type_map: dict, sink, base: str,
+                     shard_rows: int | None = None, shard_bytes: int | None = None,
+                     gzip_csv: bool = False) -> dict:
+    """
+    Write the CSV output as one or more shards into an output sink
+    (a DirectorySink, or anything with the same open/size methods such as
+    bundles.BundleBuilder). Every shard repeats the header
+    and is reordered for BigQuery Autodetect on its own. With gzip_csv the
+    shards are rendered in order and compressed on a thread pool of
+    COMPRESS_WORKERS (zlib releases the GIL), keeping at most that many
+    shards in flight.
+
+    Returns the manifest: shard files, row and byte counts and any records
+    with unbalanced quotes. It is also written to <base>_manifest.json
+    whenever the output is sharded or compressed.
+    """
+    rows = csv_shard_rows(df, shard_rows, shard_bytes)
+    starts = list(range(0, len(df), rows)) or [0]
+    total = len(starts)
+    suffix = ".csv.gz" if gzip_csv else ".csv"
+
+    def shard_name(i):
+        return f"{base}{suffix}" if total == 1 else f"{base}-{i:05d}-of-{total:05d}{suffix}"
+
+    def parts():
+        for i, start in enumerate(starts):
+            part = df.iloc[start:start + rows]
+            # Ensure autodetect sees STRING columns as text early
+            yield i, reorder_for_bq_autodetect(part, bq_type_map)
+
+    shards = []
+    if not gzip_csv:
+        for i, part in parts():
+            name = shard_name(i)
+            with sink.open(name, "w") as f:
+                bad_records = write_clean_csv(part, f)
+            shards.append({"file": name, "rows": len(part), "bytes": sink.size(name),
+                           "bad_records": bad_records})
+    else:
+        def finish(job):
+            i, n_rows, bad_records, future = job
+            name = shard_name(i)
+            data = future.result()
+            with sink.open(name, "wb") as f:
+                f.write(data)
+            shards.append({"file": name, "rows": n_rows, "bytes": len(data),
+                           "bad_records": bad_records})
+
+        with ThreadPoolExecutor(max_workers=COMPRESS_WORKERS) as pool:
+            in_flight = deque()
+            for i, part in parts():
+                text, bad_records = render_clean_csv(part)
+                future = pool.submit(gzip.compress, text.encode("utf-8"), GZIP_LEVEL, mtime=0)
+                in_flight.append((i, len(part), bad_records, future))
+                if len(in_flight) >= COMPRESS_WORKERS:
+                    finish(in_flight.popleft())
+            while in_flight:
+                finish(in_flight.popleft())
+
+    manifest = {
+        "format": "csv",
+        "compression": "gzip" if gzip_csv else None,
+        # The total keeps a wildcard load from also matching shards of another shard count
+        "uri_pattern": f"{base}-*-of-{total:05d}{suffix}" if total > 1 else shard_name(0),
+        "total_rows": len(df),
+        "shards": shards,
+    }
+    if total > 1 or gzip_csv:
+        with sink.open(f"{base}_manifest.json", "w") as f:
+            json.dump(manifest, f, indent=2)
+    return manifest
+
 def find_unbalanced_quote_lines(path: Path):
-    bad = []
+    """
+    Check an already written CSV. A newline inside an open quote continues
+    the current record (multi-line text field), so the only detectable
+    imbalance is a quote left open at end of file; its record is returned.
+    New outputs are checked per record by write_clean_csv instead.
+    """
+    records, quotes = 0, 0
     with open(path, "r", encoding="utf-8", newline="") as f:
-        for i, line in enumerate(f, 1):
-            if line.count('"') % 2:
-                bad.append(i)
-    return bad
+        for line in f:
+            if quotes == 0:
+                records += 1
+            quotes = (quotes + line.count('"')) % 2
+    return [records] if quotes else []
 
 def write_bq_text_schema(bq_type_map: dict, path: Path):
     """
     Write BigQuery schema in text form suitable for 'Edit as text' box.
     One field per line: name:TYPE,MODE  (MODE is usually NULLABLE)
     """
-    with open(path, "w", encoding="utf-8") as f:
+    with _open_output(path, "w") as f:
         for col, typ in bq_type_map.items():
             f.write(f"{col}:{_map_bq_type_for_schema(typ)},NULLABLE\n")
 
-def process_sheet(sheet_name: str, df_raw: pd.DataFrame, out_dir: Path, override_types: dict | None = None):
+def write_parquet(df: pd.DataFrame, schema: list, path: Path):
+    """
+    Write the typed frame as Parquet with BigQuery-friendly logical types
+    (DATE -> date32, TIMESTAMP -> UTC timestamp[us]) and the JSON schema
+    embedded in the file metadata under "bq_schema".
+    Needs pyarrow, which is only imported when this output is requested.
+    """
+    try:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+    except ImportError as e:
+        raise ImportError("Parquet output requires pyarrow (pip install pyarrow)") from e
+
+    arrow_types = {
+        "STRING": pa.string(),
+        "INTEGER": pa.int64(),
+        "FLOAT": pa.float64(),
+        "BOOLEAN": pa.bool_(),
+        "DATE": pa.date32(),
+        "TIMESTAMP": pa.timestamp("us", tz="UTC"),
+    }
+    arrays, fields = [], []
+    for field in schema:
+        col, arrow_type = field["name"], arrow_types[field["type"]]
+        arr = pa.array(df[col], from_pandas=True)
+        if field["type"] == "TIMESTAMP" and arr.type.tz is None:
+            # naive values are UTC for BigQuery, same as the CSV output
+            arr = arr.cast(pa.timestamp(arr.type.unit, tz="UTC"))
+        arrays.append(arr.cast(arrow_type, safe=False))
+        fields.append(pa.field(col, arrow_type, nullable=True))
+
+    metadata = {b"bq_schema": json.dumps(schema).encode("utf-8")}
+    table = pa.Table.from_arrays(arrays, schema=pa.schema(fields, metadata=metadata))
+    with _open_output(path, "wb") as f:
+        pq.write_table(
+            table,
+            f,
+            row_group_size=PARQUET_ROW_GROUP_ROWS,
+            compression=PARQUET_COMPRESSION,
+        )
+
+AVRO_TYPES = {
+    "STRING": "string",
+    "INTEGER": "long",
+    "FLOAT": "double",
+    "BOOLEAN": "boolean",
+    "DATE": {"type": "int", "logicalType": "date"},
+    "TIMESTAMP": {"type": "long", "logicalType": "timestamp-micros"},
+}
+
+def _avro_name(name: str, fallback: str = "_") -> str:
+    """name as a valid Avro name ([A-Za-z_][A-Za-z0-9_]*), which spec-compliant readers require."""
+    name = re.sub(r"[^A-Za-z0-9_]", "_", name) or fallback
+    return f"_{name}" if name[0].isdigit() else name
+
+def _avro_field_names(schema: list) -> list:
+    """Avro name per field of a BigQuery JSON schema; two columns may not end up with the same one."""
+    names = {}
+    for field in schema:
+        name = _avro_name(field["name"])
+        if name in names:
+            raise ValueError(
+                f"Columns {names[name]!r} and {field['name']!r} both become Avro field {name!r}; rename one"
+            )
+        names[name] = field["name"]
+    return list(names)
+
+def avro_schema_from_bq(schema: list, record_name: str) -> dict:
+    """
+    Avro record schema for a BigQuery JSON schema (as built by
+    bq_schema_from_df). Every field is a nullable union, matching NULLABLE.
+    Record and field names are made valid Avro names (e.g. 1_id -> _1_id).
+    """
+    return {
+        "type": "record",
+        "name": _avro_name(record_name, "Sheet"),
+        "fields": [
+            {"name": name, "type": ["null", AVRO_TYPES[field["type"]]], "default": None}
+            for name, field in zip(_avro_field_names(schema), schema)
+        ],
+    }
+
+def _typed_column_values(s: pd.Series, bq_type: str, temporal: str = "epoch") -> list:
+    """
+    Python values for one column slice with None for nulls. DATE/TIMESTAMP
+    become epoch days/micros (temporal="epoch", Avro) or the same ISO strings
+    the CSV output uses (temporal="iso", JSON).
+    """
+    if bq_type in {"DATE", "TIMESTAMP"}:
+        values = _naive_datetime64(s)
+        if values is not None:
+            if temporal == "iso":
+                fmt = "%Y-%m-%d" if bq_type == "DATE" else "%Y-%m-%d %H:%M:%S"
+                out = format_datetime_iso(s, fmt).to_numpy(dtype=object)
+            else:
+                unit = "D" if bq_type == "DATE" else "us"
+                out = values.astype(f"datetime64[{unit}]").view("i8").astype(object)
+            out[np.isnat(values)] = None
+            return out.tolist()
+    return s.to_numpy(dtype=object, na_value=None).tolist()
+
+def iter_avro_records(df: pd.DataFrame, schema: list, batch_rows: int):
+    """Yield row dicts (keyed by Avro field name), converting the typed columns one batch at a time."""
+    cols = _avro_field_names(schema)
+    for start in range(0, len(df), batch_rows):
+        batch = df.iloc[start:start + batch_rows]
+        columns = [_typed_column_values(batch[field["name"]], field["type"]) for field in schema]
+        for row in zip(*columns):
+            yield dict(zip(cols, row))
+
+def write_avro(df: pd.DataFrame, schema: list, path: Path, record_name: str):
+    """
+    Stream the typed frame into an Avro container file. Records are written
+    in blocks of roughly AVRO_SYNC_INTERVAL bytes using AVRO_CODEC
+    ("deflate", "snappy" or "null"). Needs fastavro, imported on demand.
+    """
+    try:
+        import fastavro
+    except ImportError as e:
+        raise ImportError("Avro output requires fastavro (pip install fastavro)") from e
+
+    parsed = fastavro.parse_schema(avro_schema_from_bq(schema, record_name))
+    with _open_output(path, "wb") as f:
+        fastavro.writer(
+            f,
+            parsed,
+            iter_avro_records(df, schema, AVRO_BATCH_ROWS),
+            codec=AVRO_CODEC,
+            sync_interval=AVRO_SYNC_INTERVAL,
+        )
+
+def write_ndjson(df: pd.DataFrame, schema: list, path: Path):
+    """
+    Write the typed frame as newline-delimited JSON for BigQuery, one object
+    per row. Null fields are left out, DATE/TIMESTAMP use the same text as the
+    CSV output, and rows are serialized NDJSON_BATCH_ROWS at a time so memory
+    stays bounded by the batch size.
+    """
+    encode = json.JSONEncoder(ensure_ascii=False, separators=(",", ":")).encode
+    cols = [field["name"] for field in schema]
+    with _open_output(path, "w") as f:
+        for start in range(0, len(df), NDJSON_BATCH_ROWS):
+            batch = df.iloc[start:start + NDJSON_BATCH_ROWS]
+            columns = [_typed_column_values(batch[field["name"]], field["type"], temporal="iso") for field in schema]
+            lines = [
+                encode({k: v for k, v in zip(cols, row) if v is not None})
+                for row in zip(*columns)
+            ]
+            f.write("\n".join(lines))
+            f.write("\n")
+
+def type_sheet(df_raw: pd.DataFrame, override_types: dict | None = None, progress=None):
+    """
+    Clean headers and cells and type every column: coerced to override_types
+    where given, inferred otherwise. Returns the typed frame, the type per
+    column and the date format per date/timestamp column.
+    """
+    progress = progress or (lambda stage, done, total: None)
+
     # Header cleanup
+    progress("cleaning", 0, df_raw.shape[1])
     df_raw.columns = [simple_header(c) for c in df_raw.columns]
 
     # Cell cleanup
@@ -377,7 +811,8 @@ def process_sheet(sheet_name: str, df_raw: pd.DataFrame, out_dir: Path, override
     date_fmt_map = {}
     bq_type_map = {}
 
-    for col in df_raw.columns:
+    for i, col in enumerate(df_raw.columns):
+        progress("typing", i, df_raw.shape[1])
         if override_types is not None and col in override_types:
             ser, bq_type, date_fmt = coerce_column_to_type(df_raw[col], override_types[col])
         else:
@@ -390,40 +825,113 @@ def process_sheet(sheet_name: str, df_raw: pd.DataFrame, out_dir: Path, override
         elif bq_type == "TIMESTAMP":
             date_fmt_map[col] = "%Y-%m-%d %H:%M:%S"
 
-    df_clean = pd.DataFrame(typed)
-    df_to_write = format_dates_for_csv(df_clean, date_fmt_map)
+    return pd.DataFrame(typed), bq_type_map, date_fmt_map
 
-    # Ensure autodetect sees STRING columns as text early
-    df_to_write = reorder_for_bq_autodetect(df_to_write, bq_type_map)
+def output_base(sheet_name: str) -> str:
+    """File name stem of a sheet's outputs."""
+    return re.sub(r"[^A-Za-z0-9_-]+", "_", sheet_name).strip("_") or "Sheet"
 
-    # Outputs
-    safe = re.sub(r"[^A-Za-z0-9_-]+", "_", sheet_name).strip("_") or "Sheet"
-    out_dir.mkdir(parents=True, exist_ok=True)
-    csv_path = out_dir / f"{safe}.csv"
-    schema_path = out_dir / f"{safe}_bq_schema.json"
-    schema_text_path = out_dir / f"{safe}_bq_schema.txt"
-    summary_path = out_dir / f"{safe}_summary.txt"
-
-    write_clean_csv(df_to_write, csv_path)
+def process_sheet(sheet_name: str, df_raw: pd.DataFrame, out_dir, override_types: dict | None = None,
+                  output_format: str | None = None, shard_rows: int | None = None,
+                  shard_bytes: int | None = None, gzip_csv: bool | None = None, progress=None) -> dict:
+    """
+    Clean, type and write one sheet. out_dir is a directory path or an
+    output sink (see write_csv_shards) that receives every output file.
+    progress, if given, is called as progress(stage, done, total) while the
+    sheet is cleaned, typed column by column and written; an exception it
+    raises (e.g. a cancellation) aborts the sheet before anything is written
+    for a stage that has not started.
 
-    bad_lines = find_unbalanced_quote_lines(csv_path)
-    if bad_lines:
-        print(f"Warning: {len(bad_lines)} line(s) have unbalanced quotes. Example lines: {bad_lines[:5]}")
+    Returns what was produced: sheet, rows, types, output files and the
+    number of records with unbalanced quotes (bad_records).
+    """
+    progress = progress or (lambda stage, done, total: None)
+    output_format = (output_format or OUTPUT_FORMAT).lower()
+    shard_rows = CSV_SHARD_ROWS if shard_rows is None else shard_rows
+    shard_bytes = CSV_SHARD_BYTES if shard_bytes is None else shard_bytes
+    gzip_csv = CSV_GZIP if gzip_csv is None else gzip_csv
+    if output_format not in OUTPUT_FORMATS:
+        raise ValueError(f"Unsupported output format: {output_format}. Use one of {', '.join(OUTPUT_FORMATS)}")
 
+    df_clean, bq_type_map, date_fmt_map = type_sheet(df_raw, override_types, progress)
     schema = bq_schema_from_df(df_clean, date_fmt_map)
-    with open(schema_path, "w", encoding="utf-8") as f:
+    progress("writing", df_clean.shape[1], df_clean.shape[1])
+
+    # Outputs
+    safe = output_base(sheet_name)
+    sink = DirectorySink(out_dir) if isinstance(out_dir, (str, os.PathLike)) else out_dir
+    data_name = f"{safe}.{output_format}"
+    schema_name = f"{safe}_bq_schema.json"
+    schema_text_name = f"{safe}_bq_schema.txt"
+    summary_name = f"{safe}_summary.txt"
+    outputs = [data_name]
+    bad_record_count = 0
+
+    if output_format == "parquet":
+        # Typed columnar output: no autodetect, so no reordering or quoting concerns
+        with sink.open(data_name, "wb") as f:
+            write_parquet(df_clean, schema, f)
+    elif output_format == "avro":
+        with sink.open(data_name, "wb") as f:
+            write_avro(df_clean, schema, f, safe)
+    elif output_format == "ndjson":
+        with sink.open(data_name, "w") as f:
+            write_ndjson(df_clean, schema, f)
+    else:
+        df_to_write = format_dates_for_csv(df_clean, date_fmt_map)
+        manifest = write_csv_shards(df_to_write, bq_type_map, sink, safe,
+                                    shard_rows=shard_rows, shard_bytes=shard_bytes, gzip_csv=gzip_csv)
+        data_name = manifest["shards"][0]["file"]
+        outputs = [shard["file"] for shard in manifest["shards"]]
+        if len(manifest["shards"]) > 1 or manifest["compression"]:
+            outputs.append(f"{safe}_manifest.json")
+        if len(manifest["shards"]) > 1:
+            data_name = f"{safe}_manifest.json"
+        for shard in manifest["shards"]:
+            bad_records = shard["bad_records"]
+            bad_record_count += len(bad_records)
+            if bad_records:
+                print(f"Warning: {shard['file']}: {len(bad_records)} record(s) have unbalanced quotes. Example records: {bad_records[:5]}")
+
+    with sink.open(schema_name, "w") as f:
         json.dump(schema, f, indent=2)
 
-    write_bq_text_schema(bq_type_map, schema_text_path)
+    with sink.open(schema_text_name, "w") as f:
+        write_bq_text_schema({field["name"]: field["type"] for field in schema}, f)
 
-    with open(summary_path, "w", encoding="utf-8") as f:
+    with sink.open(summary_name, "w") as f:
         f.write(f"Sheet: {sheet_name}\n")
         for col in df_clean.columns:
             f.write(f"- {col}: {bq_type_map[col]}\n")
 
-    print(f"OK: {csv_path.name}, {schema_path.name}, {schema_text_path.name}, {summary_path.name}")
+    print(f"OK: {data_name}, {schema_name}, {schema_text_name}, {summary_name}")
+    return {
+        "sheet": sheet_name,
+        "rows": len(df_clean),
+        "types": bq_type_map,
+        "outputs": outputs + [schema_name, schema_text_name, summary_name],
+        "bad_records": bad_record_count,
+    }
+
+def read_input(path, nrows: int | None = None) -> dict:
+    """Every sheet of a .xlsx/.xls/.csv file as raw strings ({sheet: frame}), optionally only the first nrows rows."""
+    path = Path(path)
+    suf = path.suffix.lower()
+    if suf in {".xlsx", ".xlsm", ".xls"}:
+        return pd.read_excel(path, sheet_name=None, dtype=str, keep_default_na=False,
+                             engine="openpyxl", nrows=nrows)
+    if suf == ".csv":
+        df = pd.read_csv(path, dtype=str, keep_default_na=False, engine="python",
+                         on_bad_lines="skip", nrows=nrows)
+        return {path.stem: df}
+    raise ValueError(f"Unsupported file type: {path}. Provide .xlsx or .csv")
+
+def profile_types(profiles: dict | None, df: pd.DataFrame) -> dict | None:
+    """Types of the saved profile matching df's header row (None: infer every column)."""
+    match = find_profile(profiles, header_signature(df)) if profiles else None
+    return dict(match[1]["types"]) if match else None
 
-def process_xlsx(xlsx_path: Path, out_dir: Path):
+def process_xlsx(xlsx_path: Path, out_dir, profiles: dict | None = None) -> list:
     sheets = pd.read_excel(
         xlsx_path,
         sheet_name=None,
@@ -431,25 +939,265 @@ def process_xlsx(xlsx_path: Path, out_dir: Path):
         keep_default_na=False,
         engine="openpyxl"
     )
-    for name, df in sheets.items():
-        process_sheet(name, df, out_dir)
+    return [process_sheet(name, df, out_dir, override_types=profile_types(profiles, df))
+            for name, df in sheets.items()]
 
-def process_csv(csv_path: Path, out_dir: Path):
+def process_csv(csv_path: Path, out_dir, profiles: dict | None = None) -> list:
     df = pd.read_csv(csv_path, dtype=str, keep_default_na=False, engine="python", on_bad_lines="skip")
-    process_sheet(csv_path.stem, df, out_dir)
+    return [process_sheet(csv_path.stem, df, out_dir, override_types=profile_types(profiles, df))]
+
+def process_file(path, out_dir, profiles: dict | None = None) -> list:
+    """
+    Process one .xlsx/.xls/.csv file into out_dir; one result per sheet.
+    Sheets matching one of the saved schema profiles use its types as
+    overrides instead of inference.
+    """
+    path = Path(path)
+    suf = path.suffix.lower()
+    if suf in {".xlsx", ".xlsm", ".xls"}:
+        return process_xlsx(path, out_dir, profiles)
+    if suf == ".csv":
+        return process_csv(path, out_dir, profiles)
+    raise ValueError(f"Unsupported file type: {path}. Provide .xlsx or .csv")
+
+def apply_settings(settings: dict):
+    """
+    Override module settings (names from CLI_SETTINGS) for this process. Also
+    the initializer of the CLI's worker processes, so every worker infers
+    with the same thresholds as the parent.
+    """
+    for name, value in settings.items():
+        if name not in CLI_SETTINGS:
+            raise KeyError(f"Unknown setting: {name}")
+        globals()[name] = value
+
+_settings_lock = threading.RLock()
+
+@contextmanager
+def override_settings(settings: dict):
+    """
+    Apply settings for the duration of the block and restore the previous
+    values afterwards. Callers in other threads wait for the block to end,
+    since the settings are module-wide.
+    """
+    with _settings_lock:
+        saved = {name: globals()[name] for name in settings if name in CLI_SETTINGS}
+        apply_settings(settings)
+        try:
+            yield
+        finally:
+            globals().update(saved)
+
+def collect_inputs(patterns, recursive: bool = False) -> list:
+    """
+    Expand files, directories and glob patterns into (path, relative output
+    dir) pairs. Directory contents are filtered to INPUT_SUFFIXES and keep
+    their sub-directory under the output dir; other inputs use their stem.
+    """
+    inputs = []
+    for pattern in patterns:
+        path = Path(pattern)
+        if path.is_dir():
+            found = path.glob("**/*" if recursive else "*")
+            for f in sorted(found):
+                if f.is_file() and f.suffix.lower() in INPUT_SUFFIXES:
+                    inputs.append((f, f.relative_to(path).with_suffix("")))
+        elif glob.has_magic(pattern):
+            for f in sorted(glob.glob(pattern, recursive=recursive)):
+                if Path(f).is_file():
+                    inputs.append((Path(f), Path(Path(f).stem)))
+        elif path.is_file():
+            inputs.append((path, Path(path.stem)))
+        else:
+            raise FileNotFoundError(f"No such file or directory: {pattern}")
+    seen, unique = set(), []
+    for path, rel in inputs:
+        if path.resolve() not in seen:
+            seen.add(path.resolve())
+            unique.append((path, rel))
+    return unique
 
-def main():
-    in_path = Path(INPUT_FILE)
-    out_dir = Path(OUTPUT_DIR)
+def run_batch(inputs, jobs: int = 1, settings: dict | None = None, profiles: dict | None = None):
+    """
+    Process (path, output dir) pairs, on `jobs` worker processes when more
+    than one. Yields (path, results, error) in input order; error is the
+    exception text when the file could not be processed.
+    """
+    settings = settings or {}
+    if jobs <= 1 or len(inputs) <= 1:
+        apply_settings(settings)
+        for path, target in inputs:
+            try:
+                yield path, process_file(path, target, profiles), None
+            except Exception as e:
+                yield path, [], f"{type(e).__name__}: {e}"
+        return
+    with ProcessPoolExecutor(max_workers=jobs, initializer=apply_settings, initargs=(settings,)) as pool:
+        futures = [(path, pool.submit(process_file, path, target, profiles)) for path, target in inputs]
+        for path, future in futures:
+            try:
+                yield path, future.result(), None
+            except Exception as e:
+                yield path, [], f"{type(e).__name__}: {e}"
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(
+        description="Clean Excel/CSV files and write BigQuery-ready outputs and schemas."
+    )
+    parser.add_argument("inputs", nargs="*", default=[INPUT_FILE],
+                        help=f"files, directories or glob patterns (default: {INPUT_FILE})")
+    parser.add_argument("-o", "--output-dir", default=OUTPUT_DIR,
+                        help=f"output directory (default: {OUTPUT_DIR})")
+    parser.add_argument("-r", "--recursive", action="store_true",
+                        help="descend into sub-directories (and let ** match in glob patterns)")
+    parser.add_argument("-j", "--jobs", type=int, default=1,
+                        help="files processed in parallel worker processes (default: 1)")
+    parser.add_argument("--force", action="store_true",
+                        help="reprocess every input, even those the run manifest shows unchanged")
+    parser.add_argument("--profiles", metavar="PATH",
+                        help="saved schema profiles (JSON, as saved from the app); matching sheets skip inference")
+    parser.add_argument("--expect-schema", metavar="PATH",
+                        help="pre-flight drift check against a stored _bq_schema.json (or a directory of them "
+                             "such as a previous output dir, matched by input and sheet name); drifted files, and files with a sheet that has no "
+                             "stored schema, are not processed")
+    parser.add_argument("--check-only", action="store_true",
+                        help="with --expect-schema: only run the drift check, write nothing")
+    parser.add_argument("--watch", action="store_true",
+                        help="keep running and process files as they arrive in the input directory")
+    dates = parser.add_mutually_exclusive_group()
+    dates.add_argument("--dayfirst", dest="dayfirst", action="store_true", default=None,
+                       help="dates are usually DD/MM/YYYY")
+    dates.add_argument("--monthfirst", dest="dayfirst", action="store_false",
+                       help="dates are usually MM/DD/YYYY")
+    parser.add_argument("--thresh-date", type=float, help=f"share of parsable rows to accept a date (default: {THRESH_DATE})")
+    parser.add_argument("--thresh-numeric", type=float, help=f"numeric threshold (default: {THRESH_NUMERIC})")
+    parser.add_argument("--max-rows-sample", type=int, help=f"rows sampled per column for inference (default: {MAX_ROWS_SAMPLE})")
+    parser.add_argument("--decimal-char", help=f"decimal separator (default: {DECIMAL_CHAR!r})")
+    parser.add_argument("--format", choices=OUTPUT_FORMATS, help=f"output format (default: {OUTPUT_FORMAT})")
+    parser.add_argument("--shard-rows", type=int, help="split CSV output every N rows")
+    parser.add_argument("--shard-bytes", type=int, help="split CSV output into shards of about N bytes")
+    parser.add_argument("--gzip", action="store_true", default=None, help="write .csv.gz shards")
+    return parser
+
+def effective_settings(settings: dict) -> dict:
+    """Values of all CLI_SETTINGS once the given overrides are applied."""
+    return {name: settings.get(name, globals()[name]) for name in CLI_SETTINGS}
+
+def settings_from_args(args) -> dict:
+    """CLI_SETTINGS overrides given on the command line."""
+    values = {
+        "DAYFIRST_HINT": args.dayfirst,
+        "THRESH_DATE": args.thresh_date,
+        "THRESH_NUMERIC": args.thresh_numeric,
+        "MAX_ROWS_SAMPLE": args.max_rows_sample,
+        "DECIMAL_CHAR": args.decimal_char,
+        "OUTPUT_FORMAT": args.format,
+        "CSV_SHARD_ROWS": args.shard_rows,
+        "CSV_SHARD_BYTES": args.shard_bytes,
+        "CSV_GZIP": args.gzip,
+    }
+    return {name: value for name, value in values.items() if value is not None}
+
+def main(argv=None) -> int:
+    """
+    Command-line entry point. Exit status: 0 when every file was processed
+    cleanly, 1 when any file failed, drifted from --expect-schema (or has a
+    sheet with no stored schema there) or has records with unbalanced
+    quotes, 2 for usage errors. Inputs the run manifest in the output dir shows as
+    unchanged (same contents, settings and overrides, outputs present) are
+    skipped unless --force is given.
+    """
+    parser = build_parser()
+    args = parser.parse_args(argv)
+    if args.jobs < 1:
+        parser.error("--jobs must be at least 1")
+    if args.check_only and not args.expect_schema:
+        parser.error("--check-only needs --expect-schema")
+    if args.watch and args.expect_schema:
+        parser.error("--expect-schema can't be combined with --watch")
+    if args.expect_schema and not Path(args.expect_schema).exists():
+        parser.error(f"No such schema file or directory: {args.expect_schema}")
+    if args.profiles and not Path(args.profiles).is_file():
+        parser.error(f"No such profiles file: {args.profiles}")
+    profiles = load_profiles(args.profiles) if args.profiles else None
+    if args.watch:
+        if len(args.inputs) != 1 or not Path(args.inputs[0]).is_dir():
+            parser.error("--watch takes exactly one input directory")
+        from watcher import watch_folder
+        return watch_folder(args.inputs[0], args.output_dir, jobs=args.jobs,
+                            settings=settings_from_args(args), recursive=args.recursive,
+                            profiles=profiles)
+    try:
+        found = collect_inputs(args.inputs, recursive=args.recursive)
+    except FileNotFoundError as e:
+        parser.error(str(e))
+    if not found:
+        parser.error("no .xlsx/.xls/.csv inputs found")
+
+    batch = len(found) > 1
+    failed = 0
+    if args.expect_schema:
+        from drift import check_file
+        apply_settings(settings_from_args(args))
+        checked = []
+        for path, rel in found:
+            try:
+                reports = check_file(path, args.expect_schema, rel=rel)
+            except Exception as e:
+                print(f"FAILED: {path}: {type(e).__name__}: {e}", file=sys.stderr)
+                failed += 1
+                continue
+            for report in reports:
+                print(report.describe(), file=sys.stdout if report.ok else sys.stderr)
+            if all(report.ok for report in reports):
+                checked.append((path, rel))
+            else:
+                failed += 1
+        if args.check_only:
+            print(f"Checked {len(found)} file(s), {failed} with drift, missing schemas or errors")
+            return 1 if failed else 0
+        found = checked
+
+    out_dir = Path(args.output_dir)
     out_dir.mkdir(parents=True, exist_ok=True)
+    # A single input writes straight into the output dir, a batch gets one sub-directory per file
+    inputs = [(path, out_dir / rel if batch else out_dir) for path, rel in found]
 
-    suf = in_path.suffix.lower()
-    if suf in {".xlsx", ".xlsm", ".xls"}:
-        process_xlsx(in_path, out_dir)
-    elif suf == ".csv":
-        process_csv(in_path, out_dir)
-    else:
-        raise ValueError("Unsupported file type. Provide .xlsx or .csv")
+    from run_manifest import RunManifest
+    settings = settings_from_args(args)
+    recorded_settings = effective_settings(settings)
+    overrides = profiles_fingerprint(profiles)
+    manifest = RunManifest.load(out_dir)
+    skipped, stale, digests = 0, [], {}
+    for path, target in inputs:
+        digests[path] = manifest.digest(path)
+        if not args.force and manifest.is_current(path, digests[path], recorded_settings, overrides, target):
+            skipped += 1
+            manifest.refresh(path)
+            if manifest.entry(path)["state"] == "invalid":
+                print(f"INVALID (unchanged): {path}: {manifest.entry(path)['bad_records']} record(s) with unbalanced quotes", file=sys.stderr)
+                failed += 1
+        else:
+            stale.append((path, target))
+
+    targets = dict(stale)
+    try:
+        for path, results, error in run_batch(stale, jobs=args.jobs, settings=settings, profiles=profiles):
+            previous = manifest.entry(path)
+            manifest.record(path, digests[path], recorded_settings, overrides, targets[path], results, error)
+            if previous and not error:
+                remove_stale_outputs(out_dir, previous["outputs"], manifest.entry(path)["outputs"])
+            bad = sum(r["bad_records"] for r in results)
+            if error:
+                print(f"FAILED: {path}: {error}", file=sys.stderr)
+            elif bad:
+                print(f"INVALID: {path}: {bad} record(s) with unbalanced quotes", file=sys.stderr)
+            if error or bad:
+                failed += 1
+    finally:
+        manifest.save()
+    print(f"Processed {len(stale)} file(s), skipped {skipped} unchanged, {failed} with problems; outputs in {out_dir}")
+    return 1 if failed else 0
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    sys.exit(main())
\ No newline at end of file
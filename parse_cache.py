@@ -0,0 +1,223 @@
+import hashlib
+import os
+import pickle
+import shutil
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import NamedTuple
+
+import pandas as pd
+
+# general settings
+CACHE_MAX_BYTES = 1024 * 1024 * 1024  # in-memory budget for parsed uploads (LRU evicted above it)
+CACHE_SPILL_DIR = os.getenv("PARSE_CACHE_SPILL_DIR") or None  # evicted entries go here as Parquet (needs pyarrow)
+CACHE_SPILL_MAX_BYTES = 4 * 1024 * 1024 * 1024  # on-disk budget for spilled entries
+CACHE_MAX_SCHEMAS = 512  # inferred layout schemas kept (LRU); small, so counted rather than sized
+HASH_CHUNK_BYTES = 1024 * 1024
+
+
+class SheetSource(NamedTuple):
+    """A sheet of a file on the server, which jobs re-read from disk instead of being sent its frame."""
+    path: str
+    file_ext: str
+    sheet: str         # sheet name in the file (the sheet name given for a CSV)
+    rows: int
+    columns: int
+    nbytes: int        # memory of the whole string frame
+    size: int          # file size and mtime when it was read, to notice a changed file
+    mtime_ns: int
+
+
+class ParsedUpload(NamedTuple):
+    sheet_names: list
+    raw_dataframes: dict     # whole frames, or for a server file only the first rows of each sheet
+    inferred_schemas: dict
+    sources: dict | None = None  # sheet -> SheetSource for a server file
+
+
+def parse_settings(*extra) -> tuple:
+    """
+    Everything besides the file bytes that changes what a parse produces:
+    the caller's own values (file type, sheet naming) plus main's current
+    inference settings, so changing a threshold never serves stale schemas.
+    """
+    import main
+    return tuple(extra) + (
+        main.DAYFIRST_HINT, main.THRESH_NUMERIC, main.THRESH_DATE,
+        main.MAX_ROWS_SAMPLE, main.DECIMAL_CHAR,
+    )
+
+
+def upload_key(fileobj, settings: tuple = ()) -> str:
+    """Streaming SHA-256 of the file contents plus the parse settings."""
+    digest = hashlib.sha256()
+    fileobj.seek(0)
+    for chunk in iter(lambda: fileobj.read(HASH_CHUNK_BYTES), b""):
+        digest.update(chunk)
+    fileobj.seek(0)
+    digest.update(repr(settings).encode("utf-8"))
+    return digest.hexdigest()
+
+
+def path_key(path, settings: tuple = ()) -> str:
+    """
+    Key for a file read by path on the server: its resolved location, size
+    and modification time plus the parse settings. Cheap even for multi-GB
+    files, which are never read just to be hashed.
+    """
+    path = Path(path).resolve()
+    stat = path.stat()
+    key = (str(path), stat.st_size, stat.st_mtime_ns, settings)
+    return hashlib.sha256(repr(key).encode("utf-8")).hexdigest()
+
+
+def _frame_bytes(parsed: ParsedUpload) -> int:
+    return int(sum(df.memory_usage(index=True, deep=True).sum() for df in parsed.raw_dataframes.values()))
+
+
+def _copy_schema(schema: dict) -> dict:
+    return {col: dict(info) for col, info in schema.items()}
+
+
+def _copy(parsed: ParsedUpload) -> ParsedUpload:
+    """Fresh containers per caller; the cached frames themselves are never mutated by the app."""
+    return ParsedUpload(
+        list(parsed.sheet_names),
+        dict(parsed.raw_dataframes),
+        {sheet: _copy_schema(schema) for sheet, schema in parsed.inferred_schemas.items()},
+        dict(parsed.sources) if parsed.sources is not None else None,
+    )
+
+
+class ParseCache:
+    """
+    Process-wide cache of parsed uploads (raw string frames + inferred
+    schemas) keyed by upload_key(). Entries are kept in memory up to
+    max_bytes and evicted least recently used first; with a spill_dir the
+    evicted entries are written as Parquet and reloaded on the next hit
+    instead of being parsed again. Inferred layout schemas (no frames) are
+    kept apart, in an LRU of at most max_schemas entries. Safe to share
+    between sessions/threads.
+    """
+
+    def __init__(self, max_bytes: int | None = None, spill_dir=None, spill_max_bytes: int | None = None,
+                 max_schemas: int | None = None):
+        self.max_bytes = CACHE_MAX_BYTES if max_bytes is None else max_bytes
+        self.max_schemas = CACHE_MAX_SCHEMAS if max_schemas is None else max_schemas
+        self.spill_max_bytes = CACHE_SPILL_MAX_BYTES if spill_max_bytes is None else spill_max_bytes
+        spill_dir = CACHE_SPILL_DIR if spill_dir is None else spill_dir
+        self.spill_dir = Path(spill_dir) if spill_dir else None
+        self._memory = OrderedDict()   # key -> (ParsedUpload, nbytes)
+        self._spilled = OrderedDict()  # key -> nbytes on disk
+        self._schemas = OrderedDict()  # key -> inferred schema
+        self._bytes = 0
+        self._spilled_bytes = 0
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> ParsedUpload | None:
+        with self._lock:
+            if key in self._memory:
+                self._memory.move_to_end(key)
+                return _copy(self._memory[key][0])
+            if key not in self._spilled:
+                return None
+            self._spilled_bytes -= self._spilled.pop(key)
+        parsed = self._load_spilled(key)
+        if parsed is not None:
+            self.put(key, parsed)
+            return _copy(parsed)
+        return None
+
+    def put(self, key: str, parsed: ParsedUpload):
+        nbytes = _frame_bytes(parsed)
+        evicted = []
+        with self._lock:
+            if key in self._memory:
+                self._bytes -= self._memory.pop(key)[1]
+            self._memory[key] = (_copy(parsed), nbytes)
+            self._bytes += nbytes
+            while self._bytes > self.max_bytes and len(self._memory) > 1:
+                old_key, (old, old_bytes) = self._memory.popitem(last=False)
+                self._bytes -= old_bytes
+                evicted.append((old_key, old))
+        for old_key, old in evicted:
+            self._spill(old_key, old)
+
+    def get_schema(self, key: str) -> dict | None:
+        with self._lock:
+            if key not in self._schemas:
+                return None
+            self._schemas.move_to_end(key)
+            return _copy_schema(self._schemas[key])
+
+    def put_schema(self, key: str, schema: dict):
+        with self._lock:
+            self._schemas[key] = _copy_schema(schema)
+            self._schemas.move_to_end(key)
+            while len(self._schemas) > self.max_schemas:
+                self._schemas.popitem(last=False)
+
+    def get_or_parse(self, key: str, parse) -> ParsedUpload:
+        """Cached entry for key, or parse() -> ParsedUpload stored under it."""
+        parsed = self.get(key)
+        if parsed is None:
+            parsed = parse()
+            self.put(key, parsed)
+        return parsed
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "entries": len(self._memory), "bytes": self._bytes,
+                "spilled_entries": len(self._spilled), "spilled_bytes": self._spilled_bytes,
+                "schemas": len(self._schemas),
+            }
+
+    def _spill(self, key: str, parsed: ParsedUpload):
+        if self.spill_dir is None:
+            return
+        target = self.spill_dir / key
+        try:
+            target.mkdir(parents=True, exist_ok=True)
+            columns = {}
+            for i, sheet in enumerate(parsed.sheet_names):
+                df = parsed.raw_dataframes[sheet]
+                columns[sheet] = list(df.columns)
+                # Parquet needs unique string column names; the originals go in meta.pkl
+                df.set_axis([f"c{j}" for j in range(df.shape[1])], axis=1).to_parquet(
+                    target / f"{i}.parquet", index=False
+                )
+            with open(target / "meta.pkl", "wb") as f:
+                pickle.dump((parsed.sheet_names, columns, parsed.inferred_schemas, parsed.sources), f)
+        except Exception:
+            # pyarrow missing or disk trouble: the entry is simply dropped
+            shutil.rmtree(target, ignore_errors=True)
+            return
+        nbytes = sum(p.stat().st_size for p in target.iterdir())
+        dropped = []
+        with self._lock:
+            self._spilled[key] = nbytes
+            self._spilled_bytes += nbytes
+            while self._spilled_bytes > self.spill_max_bytes and self._spilled:
+                old_key, old_bytes = self._spilled.popitem(last=False)
+                self._spilled_bytes -= old_bytes
+                dropped.append(old_key)
+        for old_key in dropped:
+            shutil.rmtree(self.spill_dir / old_key, ignore_errors=True)
+
+    def _load_spilled(self, key: str) -> ParsedUpload | None:
+        target = self.spill_dir / key
+        try:
+            with open(target / "meta.pkl", "rb") as f:
+                sheet_names, columns, inferred_schemas, sources = pickle.load(f)
+            raw_dataframes = {}
+            for i, sheet in enumerate(sheet_names):
+                df = pd.read_parquet(target / f"{i}.parquet")
+                df.columns = columns[sheet]
+                raw_dataframes[sheet] = df
+        except Exception:
+            return None
+        finally:
+            shutil.rmtree(target, ignore_errors=True)
+        return ParsedUpload(sheet_names, raw_dataframes, inferred_schemas, sources)
@@ -0,0 +1,72 @@
+import hashlib
+import json
+import os
+import threading
+import time
+from pathlib import Path
+
+# general settings
+PROFILES_PATH = os.getenv("SCHEMA_PROFILES_PATH", "schema_profiles.json")  # shared by the app and the CLI
+PROFILES_VERSION = 1
+
+_lock = threading.Lock()
+
+
+def header_signature(df) -> tuple:
+    """Raw header row; sheets with equal signatures share one layout (schema)."""
+    return tuple(str(c) for c in df.columns)
+
+
+def load_profiles(path=None) -> dict:
+    """
+    Saved schema profiles: {name: {"signature": [raw headers], "types":
+    {clean column: BigQuery type}, "saved": timestamp}}. A missing or
+    unreadable file means no profiles.
+    """
+    path = Path(path or PROFILES_PATH)
+    try:
+        with open(path, encoding="utf-8") as f:
+            data = json.load(f)
+    except (OSError, ValueError):
+        return {}
+    if data.get("version") != PROFILES_VERSION:
+        return {}
+    return data.get("profiles", {})
+
+
+def find_profile(profiles: dict, signature: tuple):
+    """(name, profile) of the profile saved for this header signature, or None."""
+    for name, profile in profiles.items():
+        if tuple(profile["signature"]) == tuple(signature):
+            return name, profile
+    return None
+
+
+def save_profile(name: str, signature: tuple, types: dict, path=None) -> dict:
+    """
+    Save (or replace) a profile. A layout has at most one profile, so any
+    other profile with the same signature is replaced too. Returns the
+    updated profiles.
+    """
+    path = Path(path or PROFILES_PATH)
+    with _lock:
+        profiles = {
+            other: profile for other, profile in load_profiles(path).items()
+            if other != name and tuple(profile["signature"]) != tuple(signature)
+        }
+        profiles[name] = {"signature": list(signature), "types": dict(types), "saved": time.time()}
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_name(path.name + ".tmp")
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump({"version": PROFILES_VERSION, "profiles": profiles}, f, indent=2)
+        os.replace(tmp, path)
+    return profiles
+
+
+def profiles_fingerprint(profiles: dict) -> str | None:
+    """Short hash of the signatures and types, for recording which profiles a run used."""
+    if not profiles:
+        return None
+    content = sorted((name, profile["signature"], sorted(profile["types"].items()))
+                     for name, profile in profiles.items())
+    return hashlib.sha256(repr(content).encode("utf-8")).hexdigest()[:16]
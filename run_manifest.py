@@ -0,0 +1,103 @@
+import hashlib
+import json
+import os
+import time
+from pathlib import Path
+
+# general settings
+MANIFEST_NAME = "_run_manifest.json"  # kept in the output directory
+MANIFEST_VERSION = 1
+HASH_CHUNK_BYTES = 1024 * 1024
+
+
+def file_digest(path) -> str:
+    """Streaming SHA-256 of a file's contents."""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(HASH_CHUNK_BYTES), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class RunManifest:
+    """
+    Record of a previous CLI run over an output directory: per input its
+    content hash (plus size and mtime, so unchanged files are not even
+    re-read), the settings and schema overrides it was processed with, its
+    outputs and how it went. An input is current, and can be skipped, when
+    all of these still match and its outputs still exist.
+    """
+
+    def __init__(self, path, entries: dict | None = None):
+        self.path = Path(path)
+        self.entries = entries or {}
+
+    @classmethod
+    def load(cls, out_dir) -> "RunManifest":
+        path = Path(out_dir) / MANIFEST_NAME
+        try:
+            with open(path, encoding="utf-8") as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return cls(path)
+        if data.get("version") != MANIFEST_VERSION:
+            return cls(path)
+        return cls(path, data.get("inputs", {}))
+
+    @staticmethod
+    def key(path) -> str:
+        return str(Path(path).resolve())
+
+    def digest(self, path) -> str:
+        """Content hash of path, reusing the recorded one while size and mtime are unchanged."""
+        stat = os.stat(path)
+        entry = self.entries.get(self.key(path))
+        if entry and (entry["size"], entry["mtime_ns"]) == (stat.st_size, stat.st_mtime_ns):
+            return entry["sha256"]
+        return file_digest(path)
+
+    def _target(self, target) -> str:
+        return Path(target).relative_to(self.path.parent).as_posix()
+
+    def is_current(self, path, digest: str, settings: dict, overrides, target) -> bool:
+        entry = self.entries.get(self.key(path))
+        if entry is None or entry["state"] == "failed":
+            return False
+        recorded = (entry["sha256"], entry["settings"], entry["overrides"], entry["target"])
+        if recorded != (digest, settings, overrides, self._target(target)):
+            return False
+        return all((self.path.parent / name).exists() for name in entry["outputs"])
+
+    def refresh(self, path):
+        """Record the current size and mtime of a skipped input (e.g. touched but unchanged)."""
+        stat = os.stat(path)
+        self.entries[self.key(path)].update(size=stat.st_size, mtime_ns=stat.st_mtime_ns)
+
+    def entry(self, path) -> dict | None:
+        return self.entries.get(self.key(path))
+
+    def record(self, path, digest: str, settings: dict, overrides, target, results: list,
+               error: str | None = None):
+        """Store the outcome of processing path into the target output dir."""
+        stat = os.stat(path)
+        target = Path(target)
+        outputs = [
+            (target / name).relative_to(self.path.parent).as_posix()
+            for result in results for name in result["outputs"]
+        ]
+        bad_records = sum(result["bad_records"] for result in results)
+        self.entries[self.key(path)] = {
+            "sha256": digest, "size": stat.st_size, "mtime_ns": stat.st_mtime_ns,
+            "settings": settings, "overrides": overrides,
+            "target": self._target(target), "outputs": outputs,
+            "state": "failed" if error else "invalid" if bad_records else "done",
+            "bad_records": bad_records, "error": error, "processed": time.time(),
+        }
+
+    def save(self):
+        """Write the manifest atomically."""
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = self.path.with_name(self.path.name + ".tmp")
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump({"version": MANIFEST_VERSION, "inputs": self.entries}, f, indent=1)
+        os.replace(tmp, self.path)
@@ -0,0 +1,277 @@
+import io
+import os
+from typing import NamedTuple
+
+import pandas as pd
+
+from bundles import BundleBuilder
+from jobs import JobCancelled
+from main import NA_MAP, infer_column, process_sheet, simple_header, strip_cell
+from parse_cache import ParsedUpload, SheetSource
+
+# Units of work the app runs in worker processes: plain functions of
+# (job, *args) with picklable arguments and results, no Streamlit.
+
+# general settings
+PARSE_MEMORY_FACTOR = {"csv": 6, "xlsx": 25, "xlsm": 25, "xls": 15}  # peak memory per byte of upload
+PROCESS_MEMORY_FACTOR = 4  # peak memory per byte of the parsed string frames
+PARSE_SECONDS_PER_MB = {"csv": 0.3, "xlsx": 3.0, "xlsm": 3.0, "xls": 1.5}  # read time per MB of upload
+PROCESS_SECONDS_PER_MCELL = 2.0  # typing + writing time per million cells
+SHEET_OVERHEAD_SECONDS = 0.2     # fixed cost per sheet (schema files, summary, bundling)
+PROFILE_SAMPLE_VALUES = 5        # sample values shown per column for a layout with a saved profile
+SERVER_SAMPLE_ROWS = 1000        # rows per sheet of a server file sent back to the app for the review
+
+
+class ProcessedSheets(NamedTuple):
+    sheet_names: list   # sheets whose outputs are complete
+    entries: list       # bundles.CompressedEntry for every output file
+
+
+def perform_initial_inference(df_raw: pd.DataFrame, progress=None):
+    """
+    Perform initial type inference on the raw dataframe.
+    Returns a dictionary with column info: {col_name: {'type': bq_type, 'sample_values': [...], 'null_count': int}}
+    progress works like process_sheet's: progress(stage, done, total) per column.
+    """
+    progress = progress or (lambda stage, done, total: None)
+
+    # Clean headers
+    progress("cleaning", 0, df_raw.shape[1])
+    df_raw.columns = [simple_header(c) for c in df_raw.columns]
+
+    # Clean cells
+    df_raw = df_raw.applymap(strip_cell)
+
+    schema_info = {}
+
+    for i, col in enumerate(df_raw.columns):
+        progress("inferring", i, df_raw.shape[1])
+        # Perform inference
+        ser, bq_type, date_fmt = infer_column(df_raw[col], col)
+
+        # Get non-null values for sampling
+        non_null_series = ser.dropna()
+        null_count = len(ser) - len(non_null_series)
+
+        # Smart sampling: get 5-7 diverse sample values from different parts
+        num_samples = min(7, len(non_null_series))
+        sample_values = []
+
+        if num_samples > 0:
+            if num_samples <= 3:
+                # If we have 3 or fewer non-null values, just take all of them
+                sample_values = non_null_series.head(num_samples).tolist()
+            else:
+                # Get diverse samples: first, middle, and last values
+                # First value
+                sample_values.append(non_null_series.iloc[0])
+
+                # Middle values (spread out)
+                if num_samples >= 5:
+                    mid_start = len(non_null_series) // 4
+                    mid_end = 3 * len(non_null_series) // 4
+                    middle_indices = [
+                        mid_start,
+                        len(non_null_series) // 2,
+                        mid_end
+                    ]
+                    for idx in middle_indices:
+                        if len(sample_values) < num_samples:
+                            sample_values.append(non_null_series.iloc[idx])
+
+                # Last value
+                if len(sample_values) < num_samples:
+                    sample_values.append(non_null_series.iloc[-1])
+
+                # Fill remaining slots with evenly spaced values
+                if len(sample_values) < num_samples:
+                    remaining = num_samples - len(sample_values)
+                    step = max(1, len(non_null_series) // (remaining + 1))
+                    for i in range(1, remaining + 1):
+                        idx = i * step
+                        if idx < len(non_null_series) and len(sample_values) < num_samples:
+                            if non_null_series.iloc[idx] not in sample_values:
+                                sample_values.append(non_null_series.iloc[idx])
+
+                # Remove duplicates while preserving order
+                seen = set()
+                unique_samples = []
+                for val in sample_values:
+                    if val not in seen:
+                        seen.add(val)
+                        unique_samples.append(val)
+                sample_values = unique_samples[:num_samples]
+
+        # Format sample values for display
+        sample_display = []
+        for val in sample_values:
+            if isinstance(val, (int, float)):
+                sample_display.append(str(val))
+            elif isinstance(val, pd.Timestamp):
+                sample_display.append(val.strftime("%Y-%m-%d %H:%M:%S"))
+            else:
+                str_val = str(val)
+                # Truncate long strings
+                if len(str_val) > 30:
+                    str_val = str_val[:27] + "..."
+                sample_display.append(str_val)
+
+        schema_info[col] = {
+            'type': bq_type,
+            'sample_values': sample_display,
+            'null_count': null_count,
+            'total_count': len(ser)
+        }
+
+    return schema_info
+
+
+def profile_schema(df_raw: pd.DataFrame, types: dict) -> dict:
+    """
+    Review schema for a layout with a saved profile: the profile's types plus
+    a few sample values and the null count, in perform_initial_inference's
+    format but without running any inference.
+    """
+    na_values = [key for key in NA_MAP if isinstance(key, str)]
+    schema_info = {}
+    for raw_col, col in zip(df_raw.columns, [simple_header(c) for c in df_raw.columns]):
+        cells = df_raw[raw_col].astype(str).str.strip()
+        present = cells[~cells.isin(na_values)]
+        sample_values = []
+        for val in present.drop_duplicates().head(PROFILE_SAMPLE_VALUES):
+            sample_values.append(val if len(val) <= 30 else val[:27] + "...")
+        schema_info[col] = {
+            'type': types.get(col, 'STRING'),
+            'sample_values': sample_values,
+            'null_count': int(len(cells) - len(present)),
+        }
+    return schema_info
+
+
+def read_sheets(uploaded_file, file_ext: str, csv_sheet_name: str | None = None) -> dict:
+    """Every sheet of the upload (a file object, path or the raw bytes) as a frame of strings."""
+    if isinstance(uploaded_file, bytes):
+        uploaded_file = io.BytesIO(uploaded_file)
+    if hasattr(uploaded_file, "seek"):
+        uploaded_file.seek(0)
+    if file_ext == 'csv':
+        # For CSV, treat as single sheet named after the file
+        df_raw = pd.read_csv(uploaded_file, dtype=str, keep_default_na=False, engine="python", on_bad_lines="skip")
+        return {csv_sheet_name: df_raw}
+    # For Excel, read all sheets
+    return pd.read_excel(
+        uploaded_file,
+        sheet_name=None,
+        dtype=str,
+        keep_default_na=False,
+        engine="openpyxl"
+    )
+
+
+def read_source(source: SheetSource) -> pd.DataFrame:
+    """One sheet of a server file, read again from disk in the job that needs it."""
+    stat = os.stat(source.path)
+    if (stat.st_size, stat.st_mtime_ns) != (source.size, source.mtime_ns):
+        raise RuntimeError(f"{source.path} changed on disk since it was analyzed; select it again")
+    if source.file_ext == 'csv':
+        return read_sheets(source.path, 'csv', source.sheet)[source.sheet]
+    return pd.read_excel(source.path, sheet_name=source.sheet, dtype=str, keep_default_na=False,
+                         engine="openpyxl")
+
+
+def load_frame(frame) -> pd.DataFrame:
+    """A sheet passed to a job (a frame or a SheetSource) as a frame the job may modify."""
+    return read_source(frame) if isinstance(frame, SheetSource) else frame.copy()
+
+
+def _frame_bytes(df: pd.DataFrame) -> int:
+    return int(df.memory_usage(index=True, deep=True).sum())
+
+
+def _frame_shape(frame) -> tuple:
+    return (frame.rows, frame.columns) if isinstance(frame, SheetSource) else frame.shape
+
+
+def estimate_parse_memory(nbytes: int, file_ext: str) -> int:
+    """Rough peak memory of read_upload for an upload of nbytes."""
+    return nbytes * PARSE_MEMORY_FACTOR.get(file_ext, max(PARSE_MEMORY_FACTOR.values()))
+
+
+def estimate_process_memory(raw_dataframes: dict) -> int:
+    """Rough peak memory of process_sheets (or infer_layout) for the parsed frames (or SheetSources)."""
+    return PROCESS_MEMORY_FACTOR * sum(
+        frame.nbytes if isinstance(frame, SheetSource) else _frame_bytes(frame)
+        for frame in raw_dataframes.values()
+    )
+
+
+def estimate_parse_cost(nbytes: int, file_ext: str) -> float:
+    """Rough seconds read_upload takes for an upload of nbytes (sheets aren't known yet)."""
+    per_mb = PARSE_SECONDS_PER_MB.get(file_ext, max(PARSE_SECONDS_PER_MB.values()))
+    return nbytes / (1024 * 1024) * per_mb + SHEET_OVERHEAD_SECONDS
+
+
+def estimate_process_cost(raw_dataframes: dict) -> float:
+    """Rough seconds process_sheets (or infer_layout) takes, from each sheet's row and column counts."""
+    cells = sum(rows * max(columns, 1) for rows, columns in map(_frame_shape, raw_dataframes.values()))
+    return cells / 1e6 * PROCESS_SECONDS_PER_MCELL + SHEET_OVERHEAD_SECONDS * len(raw_dataframes)
+
+
+def read_upload(job, data, file_ext: str, csv_sheet_name: str | None = None) -> ParsedUpload:
+    """
+    Job: read the upload's sheets; inference runs per layout afterwards
+    (infer_layout). data is the uploaded bytes or a path on the server.
+    A server file's frames stay in the worker: only the first
+    SERVER_SAMPLE_ROWS rows of each sheet go back to the app, with a
+    SheetSource the infer and process jobs read the sheet from again.
+    """
+    job.report("reading")
+    if isinstance(data, bytes):
+        sheets = read_sheets(data, file_ext, csv_sheet_name)
+        return ParsedUpload(list(sheets), sheets, {})
+    stat = os.stat(data)
+    sheets = read_sheets(data, file_ext, csv_sheet_name)
+    sources = {
+        name: SheetSource(str(data), file_ext, name, df.shape[0], df.shape[1], _frame_bytes(df),
+                          stat.st_size, stat.st_mtime_ns)
+        for name, df in sheets.items()
+    }
+    samples = {name: df.head(SERVER_SAMPLE_ROWS).copy() for name, df in sheets.items()}
+    return ParsedUpload(list(sheets), samples, {}, sources)
+
+
+def infer_layout(job, frames: list, label: str) -> dict:
+    """
+    Job: initial inference for every sheet sharing one header layout,
+    run once over the sheets stacked together, so a batch of same-shaped
+    files is sampled and date-parsed once instead of once per file. A
+    SheetSource among frames is read from disk here.
+    """
+    job.report("combining", sheet=label)
+    frames = [read_source(frame) if isinstance(frame, SheetSource) else frame for frame in frames]
+    df_raw = frames[0] if len(frames) == 1 else pd.concat(frames, ignore_index=True)
+    return perform_initial_inference(df_raw, progress=job.sheet_progress(label))
+
+
+def process_sheets(job, raw_dataframes: dict, sheet_names: list, override_types: dict) -> ProcessedSheets:
+    """
+    Job: process every sheet (a frame, or a SheetSource read from disk when
+    its turn comes) into a fresh bundle and return its compressed entries. On cancel the sheet in progress is dropped and the completed
+    ones are left in job.partial.
+    """
+    bundles = BundleBuilder()
+    completed = []
+    try:
+        for i, sheet_name in enumerate(sheet_names):
+            job.report_sheets(i, len(sheet_names))
+            process_sheet(sheet_name, load_frame(raw_dataframes[sheet_name]), bundles,
+                          override_types=override_types.get(sheet_name, {}),
+                          progress=job.sheet_progress(sheet_name))
+            completed.append(sheet_name)
+        job.report_sheets(len(sheet_names), len(sheet_names))
+    except JobCancelled:
+        bundles.close()
+        job.partial = ProcessedSheets(completed, [bundles.entry(name) for name in bundles.namelist()])
+        raise
+    bundles.close()
+    return ProcessedSheets(completed, [bundles.entry(name) for name in bundles.namelist()])
@@ -0,0 +1,16 @@
+import sys
+from pathlib import Path
+
+import pytest
+
+# The modules are flat files at the repository root
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+
+@pytest.fixture(autouse=True)
+def _restore_main_settings():
+    """main.main() applies its options to main's module settings; undo that after each test."""
+    import main
+    saved = {name: getattr(main, name) for name in main.CLI_SETTINGS}
+    yield
+    main.apply_settings(saved)
@@ -0,0 +1,49 @@
+import json
+import time
+from pathlib import Path
+
+import pytest
+
+import profiles
+
+AppTest = pytest.importorskip("streamlit.testing.v1").AppTest
+
+APP = str(Path(__file__).resolve().parent.parent / "app.py")
+
+
+def _run_until(at, ready, timeout=300):
+    deadline = time.time() + timeout
+    while True:
+        at.run()
+        assert not at.exception, [e.value for e in at.exception]
+        if ready(at):
+            return at
+        assert time.time() < deadline, "app did not get there in time"
+        time.sleep(0.1)
+
+
+def test_profiled_layout_is_processed_with_profile_types_unopened(tmp_path, monkeypatch):
+    # The second file's layout has a profile keeping y as STRING, although it infers as INTEGER
+    profiles_path = tmp_path / "profiles.json"
+    profiles.save_profile("other", ("x", "y"), {"x": "STRING", "y": "STRING"}, profiles_path)
+    monkeypatch.setattr(profiles, "PROFILES_PATH", str(profiles_path))
+
+    at = AppTest.from_file(APP, default_timeout=120)
+    at.run()
+    at.file_uploader[0].set_value([
+        ("sales.csv", b"Order ID,Amount\n1,2.5\n2,3.5\n", "text/csv"),
+        ("other.csv", b"x,y\na,1\nb,2\n", "text/csv"),
+    ])
+    _run_until(at, lambda at: any(b.label == "Process with this schema" for b in at.button))
+    # Only the first layout is open in the review
+    assert at.session_state["selected_sheet"] == "sales"
+    assert at.session_state["layout_profiles"] == {"other": "other"}
+    assert at.session_state["user_selected_types"]["other"] == {"x": "STRING", "y": "STRING"}
+
+    [b for b in at.button if b.label == "Process with this schema"][0].click()
+    _run_until(at, lambda at: at.session_state["output_bundles"] is not None
+               if "output_bundles" in at.session_state else False)
+    bundles = at.session_state["output_bundles"]
+    schema_name = next(name for name in bundles.namelist() if name.endswith("other_bq_schema.json"))
+    types = {field["name"]: field["type"] for field in json.loads(bundles.read(schema_name))}
+    assert types == {"x": "STRING", "y": "STRING"}
@@ -0,0 +1,25 @@
+import pandas as pd
+import pytest
+
+import main
+
+fastavro = pytest.importorskip("fastavro")
+
+
+def test_avro_names_are_valid(tmp_path):
+    schema = [{"name": "1_id", "type": "INTEGER"}, {"name": "name", "type": "STRING"}]
+    avro = main.avro_schema_from_bq(schema, "2024 sales")
+    assert avro["name"] == "_2024_sales"
+    assert [field["name"] for field in avro["fields"]] == ["_1_id", "name"]
+
+    df = pd.DataFrame({"1_id": pd.array([1, None], dtype="Int64"), "name": ["a", "b"]})
+    path = tmp_path / "out.avro"
+    main.write_avro(df, schema, path, "2024 sales")
+    with open(path, "rb") as f:
+        assert list(fastavro.reader(f)) == [{"_1_id": 1, "name": "a"}, {"_1_id": None, "name": "b"}]
+
+
+def test_avro_name_collision_fails_clearly():
+    schema = [{"name": "1_id", "type": "INTEGER"}, {"name": "_1_id", "type": "STRING"}]
+    with pytest.raises(ValueError, match="'1_id' and '_1_id' both become Avro field '_1_id'"):
+        main.avro_schema_from_bq(schema, "sheet")
@@ -0,0 +1,26 @@
+import gzip
+import io
+import zipfile
+
+from bundles import BundleBuilder
+
+
+def test_entries_read_back_without_a_zip():
+    text = "".join(f"{i},value {i}\n" for i in range(200_000))
+    packed = gzip.compress(b"already compressed")
+    builder = BundleBuilder()
+    with builder.open("data.csv") as f:
+        f.write(text)
+    builder.add("data.csv.gz", packed)
+    builder.close()
+
+    assert builder.read("data.csv").decode() == text
+    assert builder.read("data.csv.gz") == packed
+    with builder.open_entry("data.csv") as f:
+        assert f.readline() == b"0,value 0\n"
+
+    adopted = BundleBuilder.from_entries(builder.entry(name) for name in builder.namelist())
+    assert adopted._pool is None
+    assert adopted.read("data.csv").decode() == text
+    with zipfile.ZipFile(io.BytesIO(adopted.build())) as archive:
+        assert archive.read("data.csv").decode() == text
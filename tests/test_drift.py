@@ -0,0 +1,50 @@
+import json
+
+import pytest
+
+import main
+from dataflow import Config, validate
+
+
+@pytest.fixture
+def inputs(tmp_path):
+    (tmp_path / "sales.csv").write_text("id,amount\n1,2.5\n2,3.5\n")
+    schemas = tmp_path / "schemas"
+    schemas.mkdir()
+    return tmp_path / "sales.csv", schemas
+
+
+def test_check_only_fails_a_sheet_without_stored_schema(inputs, tmp_path, capsys):
+    path, schemas = inputs
+    assert main.main([str(path), "--expect-schema", str(schemas), "--check-only",
+                      "-o", str(tmp_path / "out")]) == 1
+    assert "sales: no stored schema" in capsys.readouterr().err
+    assert not (tmp_path / "out").exists()
+
+    fields = [{"name": "id", "type": "INTEGER"}, {"name": "amount", "type": "FLOAT"}]
+    (schemas / "sales_bq_schema.json").write_text(json.dumps(fields))
+    assert main.main([str(path), "--expect-schema", str(schemas), "--check-only"]) == 0
+
+
+def test_validate_reports_a_sheet_without_stored_schema(inputs):
+    path, schemas = inputs
+    result = validate(path, Config(expect_schema=str(schemas)))
+    assert result.problems == ["sales: no stored schema"]
+
+
+def test_watch_rejects_expect_schema(inputs, tmp_path):
+    path, schemas = inputs
+    with pytest.raises(SystemExit) as exit_info:
+        main.main([str(tmp_path), "--watch", "--expect-schema", str(schemas)])
+    assert exit_info.value.code == 2
+
+
+def test_check_only_against_a_previous_batch_output_dir(tmp_path):
+    in_dir, out = tmp_path / "in", tmp_path / "out"
+    in_dir.mkdir()
+    (in_dir / "a.csv").write_text("id,amount\n1,2.5\n")
+    (in_dir / "b.csv").write_text("name,day\nx,2024-01-01\n")
+    assert main.main([str(in_dir), "-o", str(out)]) == 0
+    assert (out / "a" / "a_bq_schema.json").is_file()
+
+    assert main.main([str(in_dir), "--expect-schema", str(out), "--check-only"]) == 0
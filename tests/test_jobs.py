@@ -0,0 +1,38 @@
+import os
+import time
+
+from jobs import JobQueue
+
+
+def _crash(job):
+    os._exit(9)
+
+
+def _echo(job, value):
+    return value
+
+
+def _wait(job, timeout=60):
+    deadline = time.time() + timeout
+    while not job.finished_running:
+        assert time.time() < deadline, f"{job.label} did not finish"
+        time.sleep(0.05)
+
+
+def test_queue_recovers_after_worker_dies():
+    queue = JobQueue(workers=1, memory_budget=1 << 30)
+    try:
+        crashed = queue.submit("crash", _crash, memory=1000)
+        _wait(crashed)
+        assert crashed.state == "failed"
+        assert "BrokenProcessPool" in crashed.error
+
+        job = queue.submit("echo", _echo, 42, memory=1000)
+        _wait(job)
+        assert job.state == "done"
+        assert job.result == 42
+        stats = queue.stats()
+        assert stats["running"] == 0
+        assert stats["reserved_bytes"] == 0
+    finally:
+        queue.shutdown()
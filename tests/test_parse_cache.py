@@ -0,0 +1,14 @@
+from parse_cache import ParseCache
+
+
+def test_layout_schemas_are_bounded_apart_from_frames():
+    cache = ParseCache(max_bytes=0, max_schemas=2)
+    for key in ("a", "b", "c"):
+        cache.put_schema(key, {"col": {"type": "STRING", "sample_values": [key]}})
+    assert cache.get_schema("a") is None
+    schema = cache.get_schema("c")
+    assert schema == {"col": {"type": "STRING", "sample_values": ["c"]}}
+    schema["col"]["type"] = "INTEGER"
+    assert cache.get_schema("c")["col"]["type"] == "STRING"
+    assert cache.stats() == {"entries": 0, "bytes": 0, "spilled_entries": 0,
+                             "spilled_bytes": 0, "schemas": 2}
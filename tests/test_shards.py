@@ -0,0 +1,21 @@
+import json
+
+import main
+
+
+def test_rerun_with_another_shard_count_removes_old_shards(tmp_path):
+    path = tmp_path / "one.csv"
+    path.write_text("id,name\n1,a\n2,b\n3,c\n")
+    out = tmp_path / "out"
+
+    assert main.main([str(path), "-o", str(out), "--shard-rows", "1"]) == 0
+    assert sorted(p.name for p in out.glob("one-*.csv")) == [
+        f"one-0000{i}-of-00003.csv" for i in range(3)
+    ]
+
+    assert main.main([str(path), "-o", str(out), "--shard-rows", "2"]) == 0
+    shards = sorted(p.name for p in out.glob("one-*.csv"))
+    assert shards == ["one-00000-of-00002.csv", "one-00001-of-00002.csv"]
+    manifest = json.loads((out / "one_manifest.json").read_text())
+    assert manifest["uri_pattern"] == "one-*-of-00002.csv"
+    assert sorted(p.name for p in out.glob(manifest["uri_pattern"])) == shards
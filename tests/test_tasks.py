@@ -0,0 +1,51 @@
+import os
+import zlib
+
+import pytest
+
+import tasks
+from parse_cache import SheetSource
+
+
+class _Job:
+    """Worker-side job stand-in: progress goes nowhere."""
+
+    def report(self, stage, done=0, total=0, sheet=None):
+        pass
+
+    def report_sheets(self, done, total):
+        pass
+
+    def sheet_progress(self, sheet):
+        return lambda stage, done, total: None
+
+
+def test_server_file_stays_in_the_worker(tmp_path, monkeypatch):
+    monkeypatch.setattr(tasks, "SERVER_SAMPLE_ROWS", 10)
+    path = tmp_path / "big.csv"
+    path.write_text("id,name\n" + "".join(f"{i},n{i}\n" for i in range(250)))
+
+    parsed = tasks.read_upload(_Job(), str(path), "csv", "big")
+    assert len(parsed.raw_dataframes["big"]) == 10
+    source = parsed.sources["big"]
+    assert isinstance(source, SheetSource)
+    assert (source.rows, source.columns) == (250, 2)
+    assert tasks.estimate_process_cost({"big": source}) > tasks.estimate_process_cost(parsed.raw_dataframes)
+
+    schema = tasks.infer_layout(_Job(), [source], "big")
+    assert schema["id"]["total_count"] == 250
+    processed = tasks.process_sheets(_Job(), {"big": source}, ["big"], {"big": {}})
+    assert processed.sheet_names == ["big"]
+    csv_entry = next(entry for entry in processed.entries if entry.name == "big.csv")
+    assert zlib.decompress(csv_entry.data, -15).decode().count("\n") == 251
+
+    path.write_text("id,name\n1,a\n")
+    os.utime(path, ns=(source.mtime_ns + 10**9, source.mtime_ns + 10**9))
+    with pytest.raises(RuntimeError, match="changed on disk"):
+        tasks.read_source(source)
+
+
+def test_uploaded_bytes_are_returned_whole():
+    parsed = tasks.read_upload(_Job(), b"id\n1\n2\n", "csv", "up")
+    assert len(parsed.raw_dataframes["up"]) == 2
+    assert parsed.sources is None
@@ -0,0 +1,95 @@
+import os
+import signal
+import time
+
+from watcher import WATCH_RETRIES, FolderWatcher, _read_status
+
+
+def _scan_until(watcher, path, done, timeout=60):
+    deadline = time.time() + timeout
+    while True:
+        watcher.scan()
+        status = _read_status(watcher.status_path(path))
+        if status is not None and done(status):
+            return status
+        assert time.time() < deadline, f"{path.name} still {status and status['state']}"
+        time.sleep(0.05)
+
+
+def _scan_until_final(watcher, path, timeout=60):
+    return _scan_until(watcher, path, lambda status: status["state"] != "processing", timeout)
+
+
+def _settle(watcher):
+    """Let in-flight files finish, scanning meanwhile."""
+    while watcher._in_flight:
+        watcher.scan()
+        time.sleep(0.05)
+
+
+def test_watcher_recovers_after_worker_dies(tmp_path):
+    in_dir, out_dir = tmp_path / "in", tmp_path / "out"
+    in_dir.mkdir()
+    watcher = FolderWatcher(in_dir, out_dir, poll_seconds=0, settle_seconds=0)
+    watcher.start()
+    try:
+        for process in list(watcher._pool._processes.values()):
+            os.kill(process.pid, signal.SIGKILL)
+        first = in_dir / "first.csv"
+        first.write_text("a,b\n1,2\n")
+        status = _scan_until_final(watcher, first)
+        assert status["state"] == "failed"
+        assert "BrokenProcessPool" in status["error"]
+        # The failure was the worker's, not the file's: the retry succeeds
+        assert _scan_until(watcher, first, lambda status: status["state"] == "done")
+
+        second = in_dir / "second.csv"
+        second.write_text("a,b\n3,4\n")
+        assert _scan_until_final(watcher, second)["state"] == "done"
+        assert not watcher._in_flight
+    finally:
+        watcher.stop()
+
+
+def test_failed_file_is_retried_a_limited_number_of_times(tmp_path):
+    in_dir, out_dir = tmp_path / "in", tmp_path / "out"
+    in_dir.mkdir()
+    broken = in_dir / "broken.xlsx"
+    broken.write_bytes(b"not a workbook")
+    watcher = FolderWatcher(in_dir, out_dir, poll_seconds=0, settle_seconds=0)
+    watcher.start()
+    try:
+        submitted = 0
+        for _ in range(2 * (WATCH_RETRIES + 3)):
+            submitted += len(watcher.scan())
+            _settle(watcher)
+        assert submitted == 1 + WATCH_RETRIES
+        assert _read_status(watcher.status_path(broken))["state"] == "failed"
+    finally:
+        watcher.stop()
+
+    # A restarted watcher tries again
+    restarted = FolderWatcher(in_dir, out_dir, poll_seconds=0, settle_seconds=0)
+    restarted.start()
+    try:
+        restarted.scan()
+        assert restarted.scan() == [broken]
+        _settle(restarted)
+    finally:
+        restarted.stop()
+
+
+def test_outputs_inside_the_input_dir_are_not_inputs(tmp_path):
+    in_dir = tmp_path / "in"
+    in_dir.mkdir()
+    (in_dir / "data.csv").write_text("a,b\n1,2\n")
+    watcher = FolderWatcher(in_dir, in_dir / "out", recursive=True, poll_seconds=0, settle_seconds=0)
+    watcher.start()
+    try:
+        assert _scan_until_final(watcher, in_dir / "data.csv")["state"] == "done"
+        assert (in_dir / "out" / "data" / "data.csv").is_file()
+        for _ in range(3):
+            assert watcher.scan() == []
+        assert list(watcher._candidates()) == [in_dir / "data.csv"]
+    finally:
+        watcher.stop()
@@ -0,0 +1,231 @@
+import json
+import os
+import signal
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
+from pathlib import Path
+
+import main
+
+# general settings
+WATCH_POLL_SECONDS = 2       # how often the input directory is scanned
+WATCH_SETTLE_SECONDS = 5     # a file must keep its size and mtime this long before it is picked up
+WATCH_RETRIES = 1            # extra attempts a failed file gets per watcher run (e.g. after a worker was killed)
+STATUS_SUFFIX = ".status.json"
+IGNORED_PREFIXES = ("~$", ".")  # Office lock files and hidden/partial uploads
+
+
+def _warm_worker(settings: dict):
+    """Worker initializer: main (pandas, numpy) is imported once per process, then configured."""
+    # Ctrl+C is for the daemon, which lets the files in progress finish
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    main.apply_settings(settings)
+
+
+def _ping():
+    return os.getpid()
+
+
+def _write_status(path: Path, status: dict):
+    """Replace the status file atomically so readers never see half a file."""
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_name(path.name + ".tmp")
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(status, f, indent=2)
+    os.replace(tmp, path)
+
+
+def _read_status(path: Path) -> dict | None:
+    try:
+        with open(path, encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+class FolderWatcher:
+    """
+    Drop-folder daemon: scans in_dir every WATCH_POLL_SECONDS, and once a
+    supported file has kept the same size and mtime for WATCH_SETTLE_SECONDS
+    (so partially copied files are left alone) processes it on a pool of
+    warm worker processes. Outputs go to out_dir/<relative path>/ and a
+    <relative path>.status.json next to them records the state (processing,
+    done, invalid, failed), timings and per-sheet results. A file whose
+    status already records its current size and mtime as done or invalid
+    is not processed again, also across restarts; a changed file is. A
+    failed file is retried up to WATCH_RETRIES times per run, and again
+    after a restart.
+    """
+
+    def __init__(self, in_dir, out_dir, jobs: int = 1, settings: dict | None = None,
+                 recursive: bool = False, poll_seconds: float | None = None,
+                 settle_seconds: float | None = None, profiles: dict | None = None):
+        self.in_dir = Path(in_dir)
+        self.out_dir = Path(out_dir)
+        self.jobs = max(1, jobs)
+        self.settings = settings or {}
+        self.recursive = recursive
+        self.profiles = profiles
+        self.poll_seconds = WATCH_POLL_SECONDS if poll_seconds is None else poll_seconds
+        self.settle_seconds = WATCH_SETTLE_SECONDS if settle_seconds is None else settle_seconds
+        self._seen = {}       # path -> (signature, time the signature was first seen)
+        self._in_flight = {}  # path -> future
+        self._attempts = {}   # path -> (signature, attempts in this run)
+        self._pool = None
+        self._lock = threading.Lock()
+
+    def start(self):
+        """Start the workers and wait until each one has imported the pipeline."""
+        self.out_dir.mkdir(parents=True, exist_ok=True)
+        self._pool = self._new_pool()
+        for future in [self._pool.submit(_ping) for _ in range(self.jobs)]:
+            future.result()
+
+    def stop(self):
+        with self._lock:
+            pool, self._pool = self._pool, None
+        if pool is not None:
+            pool.shutdown(wait=True, cancel_futures=True)
+
+    def status_path(self, path: Path) -> Path:
+        return self.out_dir / f"{self._relative(path)}{STATUS_SUFFIX}"
+
+    def scan(self) -> list:
+        """One pass over in_dir; returns the files submitted for processing."""
+        now = time.time()
+        submitted = []
+        present = set()
+        for path in self._candidates():
+            try:
+                stat = path.stat()
+            except OSError:
+                continue  # removed between listing and stat
+            present.add(path)
+            signature = (stat.st_size, stat.st_mtime_ns)
+            previous = self._seen.get(path)
+            if previous is None or previous[0] != signature:
+                self._seen[path] = (signature, now)
+                continue
+            if now - previous[1] < self.settle_seconds or path in self._in_flight:
+                continue
+            if self._is_current(path, signature):
+                continue
+            if self._submit(path, signature):
+                submitted.append(path)
+        for path in set(self._seen) - present:
+            del self._seen[path]
+            self._attempts.pop(path, None)
+        return submitted
+
+    def run(self, max_scans: int | None = None):
+        """Scan until interrupted (or max_scans passes), then finish the files in progress."""
+        self.start()
+        scans = 0
+        try:
+            while max_scans is None or scans < max_scans:
+                self.scan()
+                scans += 1
+                time.sleep(self.poll_seconds)
+        except KeyboardInterrupt:
+            print("Stopping; waiting for files in progress")
+        finally:
+            wait(list(self._in_flight.values()))
+            self.stop()
+
+    def _candidates(self):
+        found = self.in_dir.glob("**/*" if self.recursive else "*")
+        out_dir = self.out_dir.resolve()
+        for path in sorted(found):
+            if path.name.startswith(IGNORED_PREFIXES) or path.suffix.lower() not in main.INPUT_SUFFIXES:
+                continue
+            if out_dir in path.resolve().parents:
+                continue  # our own outputs, when out_dir is inside in_dir
+            if path.is_file():
+                yield path
+
+    def _relative(self, path: Path) -> Path:
+        return path.relative_to(self.in_dir).with_suffix("")
+
+    def _is_current(self, path: Path, signature: tuple) -> bool:
+        status = _read_status(self.status_path(path))
+        if status is None or (status.get("size"), status.get("mtime_ns")) != signature:
+            return False
+        if status.get("state") == "failed":
+            # Retried like the CLI's run manifest does, but not on every scan
+            tried, attempts = self._attempts.get(path, (None, 0))
+            return tried == signature and attempts > WATCH_RETRIES
+        return status.get("state") in ("done", "invalid")
+
+    def _new_pool(self) -> ProcessPoolExecutor:
+        return ProcessPoolExecutor(max_workers=self.jobs, initializer=_warm_worker,
+                                   initargs=(self.settings,))
+
+    def _replace_pool(self, broken: ProcessPoolExecutor):
+        """Swap in a fresh executor after a worker died; files in progress on the old one have failed."""
+        with self._lock:
+            if self._pool is not broken:
+                return  # already replaced for another file of the same pool, or stopping
+            self._pool = self._new_pool()
+        broken.shutdown(wait=False, cancel_futures=True)
+
+    def _submit(self, path: Path, signature: tuple) -> bool:
+        tried, attempts = self._attempts.get(path, (None, 0))
+        self._attempts[path] = (signature, attempts + 1 if tried == signature else 1)
+        previous = _read_status(self.status_path(path)) or {}
+        previous_outputs = [name for sheet in previous.get("sheets", []) for name in sheet["outputs"]]
+        status = {
+            "input": str(path), "size": signature[0], "mtime_ns": signature[1],
+            "state": "processing", "started": time.time(),
+        }
+        _write_status(self.status_path(path), status)
+        pool = self._pool
+        try:
+            future = pool.submit(main.process_file, path, self.out_dir / self._relative(path),
+                                 self.profiles)
+        except BrokenProcessPool as error:
+            # A worker died and took the pool down: fail this file, carry on with a new pool
+            self._replace_pool(pool)
+            self._record(path, dict(status, state="failed", error=f"{type(error).__name__}: {error}"))
+            return False
+        self._in_flight[path] = future
+        future.add_done_callback(
+            lambda f, path=path, status=status, pool=pool, previous=previous_outputs:
+            self._finished(path, status, f, pool, previous))
+        return True
+
+    def _finished(self, path: Path, status: dict, future, pool: ProcessPoolExecutor | None = None,
+                  previous_outputs: list = ()):
+        self._in_flight.pop(path, None)
+        if future.cancelled():
+            status = dict(status, state="cancelled")
+        elif future.exception() is not None:
+            error = future.exception()
+            if isinstance(error, BrokenProcessPool) and pool is not None:
+                self._replace_pool(pool)
+            status = dict(status, state="failed", error=f"{type(error).__name__}: {error}")
+        else:
+            results = future.result()
+            main.remove_stale_outputs(self.out_dir / self._relative(path), previous_outputs,
+                                      [name for r in results for name in r["outputs"]])
+            bad = sum(r["bad_records"] for r in results)
+            status = dict(status, state="invalid" if bad else "done", bad_records=bad, sheets=results)
+        self._record(path, status)
+
+    def _record(self, path: Path, status: dict):
+        """Write the final status of a file."""
+        status = dict(status, finished=time.time())
+        status["seconds"] = round(status["finished"] - status["started"], 3)
+        _write_status(self.status_path(path), status)
+        print(f"{status['state'].upper()}: {path}")
+
+
+def watch_folder(in_dir, out_dir, jobs: int = 1, settings: dict | None = None,
+                 recursive: bool = False, profiles: dict | None = None) -> int:
+    """Run a FolderWatcher until interrupted (the CLI's --watch mode)."""
+    watcher = FolderWatcher(in_dir, out_dir, jobs=jobs, settings=settings, recursive=recursive,
+                            profiles=profiles)
+    print(f"Watching {in_dir} (outputs and status files in {out_dir}); Ctrl+C to stop")
+    watcher.run()
+    return 0